@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from supabase import create_client
 import os
 from dotenv import load_dotenv
@@ -7,15 +8,21 @@ import requests
 from PIL import Image
 import io
 import json
+import orjson
+import re
 import folium
+from folium.plugins import FastMarkerCluster
 from streamlit_folium import folium_static, st_folium
 import time
 import traceback
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 # Import the main scanning function
 try:
-    from utils.scan_location import main as scan_main
-    from utils.database import get_all_scans
+    from utils.scan_location import main as scan_main, RECENTLY_SCANNED, SCAN_CACHE_TTL
+    from utils.database import get_all_scans, invalidate_scans_cache
 except ImportError as e:
     st.error(f"Import error: {e}")
     st.stop()
@@ -65,11 +72,76 @@ def fetch_all_scans():
                 scan['latitude'] = float(scan['latitude'])
             if 'longitude' in scan:
                 scan['longitude'] = float(scan['longitude'])
+            
+            # Derive report fields once so downstream loops don't re-parse
+            report = parse_llm_report(scan.get('llm_report_structured'))
+            issues = report.get('issues', [])
+            scan['_issues'] = issues
+            scan['_summary'] = report.get('summary', '')
+            scan['_short_summary'] = scan['_summary'][:100]  # Marker popups only need a snippet
+            severity_counts = Counter(issue.get('severity', '') for issue in issues)
+            scan['_high'] = severity_counts['High']
+            scan['_medium'] = severity_counts['Medium']
+            scan['_color'] = _severity_style(scan['_high'], scan['_medium'], issues)
+            scan['_formatted_time'] = _format_scan_time(scan.get('created_at', 'Unknown time'))
         return scans
     except Exception as e:
         st.error(f"Error fetching scans: {e}")
         return []
 
+# Shared session reuses TCP/TLS connections across image downloads
+_SESSION = requests.Session()
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_image_bytes(url: str) -> bytes:
+    """Download image bytes, cached by URL (non-200 responses raise and are not cached)"""
+    response = _SESSION.get(url, timeout=10)
+    response.raise_for_status()
+    return response.content
+
+# Greedy match for the outermost JSON object embedded in free text
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def _parse_llm_report_cached(raw: str):
+    """Parse a raw LLM report string (cached by content across reruns)"""
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        # Try to extract JSON from string using regex
+        json_match = _JSON_RE.search(raw)
+        if json_match:
+            try:
+                return json.loads(json_match.group())
+            except json.JSONDecodeError:
+                pass
+        
+        # Fallback - treat as plain text summary
+        return {
+            "summary": raw[:200] + "..." if len(raw) > 200 else raw,
+            "issues": []
+        }
+
+def _format_scan_time(created_at):
+    """Format a scan's created_at timestamp for display"""
+    if 'T' in str(created_at):
+        try:
+            dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+            return dt.strftime('%Y-%m-%d %H:%M')
+        except:
+            return str(created_at)[:19]  # Take first 19 chars
+    return str(created_at)
+
+def _severity_style(high_count, medium_count, issues):
+    """Return the map marker color for a scan's issues"""
+    if high_count:
+        return 'red'
+    if medium_count:
+        return 'orange'
+    if issues:
+        return 'yellow'
+    return 'green'
+
 def parse_llm_report(report_data):
     """Parse LLM report with robust error handling"""
     if not report_data:
@@ -79,32 +151,118 @@ def parse_llm_report(report_data):
     if isinstance(report_data, dict):
         return report_data
     
-    # If it's a string, try to parse it
+    # Reports normally arrive parsed from the database layer; legacy strings that
+    # aren't valid JSON are parsed leniently once and reused on later reruns
     if isinstance(report_data, str):
-        try:
-            return json.loads(report_data)
-        except json.JSONDecodeError:
-            # Try to extract JSON from string using regex
-            import re
-            json_match = re.search(r'\{.*\}', report_data, re.DOTALL)
-            if json_match:
-                try:
-                    return json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    pass
-            
-            # Fallback - treat as plain text summary
-            return {
-                "summary": report_data[:200] + "..." if len(report_data) > 200 else report_data,
-                "issues": []
-            }
+        return _parse_llm_report_cached(report_data)
     
     # Ultimate fallback
     return {"summary": "Could not parse report data", "issues": []}
 
+# --- Map rendering ---
+# Above this many scans, markers are clustered client-side from a compact data array
+MARKER_CLUSTER_THRESHOLD = 500
+MARKER_COLORS = ['red', 'orange', 'yellow', 'green']
+
+# Leaflet callback building one canvas circle per [lat, lon, color_idx, scan_id, issues] row
+# (tooltip only; full scan details live in the results panel)
+_CLUSTER_CALLBACK = """
+function (row) {
+    var colors = %s;
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 8, color: colors[row[2]], fillColor: colors[row[2]], fillOpacity: 0.8
+    });
+    marker.bindTooltip('Scan ' + row[3] + ' - ' + row[4] + ' issues');
+    return marker;
+}
+""" % json.dumps(MARKER_COLORS)
+
+# Fraction of the viewport span added on each side, so markers just off-screen still render
+VIEWPORT_PADDING = 0.5
+
+def filter_scans_in_bounds(scans, bounds):
+    """Return the scans inside the (padded) Leaflet viewport bounds, or all scans if unknown"""
+    try:
+        south = bounds['_southWest']['lat']
+        west = bounds['_southWest']['lng']
+        north = bounds['_northEast']['lat']
+        east = bounds['_northEast']['lng']
+        lat_pad = (north - south) * VIEWPORT_PADDING
+        lon_pad = (east - west) * VIEWPORT_PADDING
+    except (KeyError, TypeError):
+        return scans
+    
+    return [
+        scan for scan in scans
+        if south - lat_pad <= scan['latitude'] <= north + lat_pad
+        and west - lon_pad <= scan['longitude'] <= east + lon_pad
+    ]
+
+def recenter_map(lat, lon):
+    """Move the map center; the last reported viewport no longer applies, so show all markers until the map reports new bounds"""
+    if st.session_state.map_center != [lat, lon]:
+        st.session_state.map_center = [lat, lon]
+        st.session_state.map_bounds = None
+
+# ~10 cm precision; keeps full float reprs out of the emitted map HTML
+COORD_PRECISION = 6
+
+def add_scan_markers(m, scans):
+    """Add scan markers to the map as canvas circles, clustering large scan sets"""
+    if len(scans) > MARKER_CLUSTER_THRESHOLD:
+        data = [
+            [round(scan['latitude'], COORD_PRECISION), round(scan['longitude'], COORD_PRECISION),
+             MARKER_COLORS.index(scan['_color']),
+             scan['id'], len(scan['_issues'])]
+            for scan in scans
+        ]
+        FastMarkerCluster(data=data, callback=_CLUSTER_CALLBACK).add_to(m)
+        return
+    
+    for scan in scans:
+        try:
+            issues = scan['_issues']
+            
+            # Compact markup; lazy popups are only rendered when opened
+            popup_text = f"<b>Scan {scan['id']}</b><br/>Issues: {len(issues)}<br/>{scan['_short_summary']}..."
+            
+            folium.CircleMarker(
+                [round(scan['latitude'], COORD_PRECISION), round(scan['longitude'], COORD_PRECISION)],
+                radius=8,
+                color=scan['_color'],
+                fill=True,
+                fill_color=scan['_color'],
+                fill_opacity=0.8,
+                popup=folium.Popup(popup_text, max_width=300, lazy=True),
+                tooltip=f"Scan {scan['id']} - {len(issues)} issues"
+            ).add_to(m)
+        except Exception as e:
+            st.warning(f"Error adding marker for scan {scan.get('id', 'unknown')}: {e}")
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_scan_map(scans_key, center, zoom, _scans):
+    """
+    Build the folium map for the given scans, cached on the marker set and viewport.
+    
+    Each rerun gets its own copy of the cached map, so st_folium can render it safely.
+    """
+    # Canvas renderer draws all markers in one layer instead of N DOM nodes
+    m = folium.Map(location=list(center), zoom_start=zoom, prefer_canvas=True)
+    if _scans:
+        add_scan_markers(m, _scans)
+    return m
+
+def load_scans():
+    """Load scans into session state together with their (high, issues) stats array"""
+    st.session_state.scans = fetch_all_scans()
+    st.session_state.scan_stats = np.array(
+        [(scan['_high'], len(scan['_issues'])) for scan in st.session_state.scans],
+        dtype=np.int32
+    ).reshape(-1, 2)
+
 # --- Session state initialization ---
 if 'scans' not in st.session_state:
-    st.session_state.scans = fetch_all_scans()
+    load_scans()
 
 if 'selected_lat' not in st.session_state:
     st.session_state.selected_lat = 40.7128  # Default to NYC
@@ -114,6 +272,8 @@ if 'map_center' not in st.session_state:
     st.session_state.map_center = [40.7128, -74.0060]
 if 'map_zoom' not in st.session_state:
     st.session_state.map_zoom = 12
+if 'map_bounds' not in st.session_state:
+    st.session_state.map_bounds = None  # Unknown until the map reports its viewport
 
 # Set the latest scan as selected default
 if 'selected_scan_id' not in st.session_state:
@@ -129,7 +289,8 @@ with st.sidebar:
     # Refresh button
     if st.button("🔄 Refresh Data", help="Refresh scan data from database"):
         fetch_all_scans.clear()  # Clear cache
-        st.session_state.scans = fetch_all_scans()
+        invalidate_scans_cache()  # Pick up scans written by other processes too
+        load_scans()
         st.rerun()
     
     # Stats
@@ -138,42 +299,34 @@ with st.sidebar:
     st.metric("Total Scans", total_scans)
     
     if st.session_state.scans:
-        # Calculate issues statistics
-        total_issues = 0
-        high_severity_issues = 0
-        
-        for scan in st.session_state.scans:
-            report = parse_llm_report(scan.get('llm_report_structured'))
-            issues = report.get('issues', [])
-            total_issues += len(issues)
-            high_severity_issues += sum(1 for issue in issues if issue.get('severity') == 'High')
-        
-        st.metric("Total Issues Found", total_issues)
-        st.metric("High Severity Issues", high_severity_issues)
+        # Issue statistics from the per-scan stats array built in load_scans
+        scan_stats = st.session_state.scan_stats
+        st.metric("Total Issues Found", int(scan_stats[:, 1].sum()))
+        st.metric("High Severity Issues", int(scan_stats[:, 0].sum()))
     
     # Export functionality
     st.subheader("💾 Export Data")
     if st.session_state.scans:
-        # Prepare data for export
-        export_data = []
-        for scan in st.session_state.scans:
-            report = parse_llm_report(scan.get('llm_report_structured'))
-            export_data.append({
-                'scan_id': scan['id'],
-                'latitude': scan['latitude'],
-                'longitude': scan['longitude'],
-                'created_at': scan.get('created_at', ''),
-                'summary': report.get('summary', ''),
-                'issues_count': len(report.get('issues', [])),
-                'high_severity_count': sum(1 for issue in report.get('issues', []) if issue.get('severity') == 'High')
-            })
-        
-        df_export = pd.DataFrame(export_data)
-        csv = df_export.to_csv(index=False)
+        # Prepare data for export, column by column from the precomputed scan fields
+        scans = st.session_state.scans
+        n_scans = len(scans)
+        df_export = pd.DataFrame({
+            'scan_id': np.fromiter((scan['id'] for scan in scans), dtype=np.int64, count=n_scans),
+            'latitude': np.fromiter((scan['latitude'] for scan in scans), dtype=np.float64, count=n_scans),
+            'longitude': np.fromiter((scan['longitude'] for scan in scans), dtype=np.float64, count=n_scans),
+            'created_at': [scan.get('created_at', '') for scan in scans],
+            'summary': [scan['_summary'] for scan in scans],
+            'issues_count': np.fromiter((len(scan['_issues']) for scan in scans), dtype=np.int64, count=n_scans),
+            'high_severity_count': np.fromiter((scan['_high'] for scan in scans), dtype=np.int64, count=n_scans)
+        })
+        # Write the CSV in chunks straight to a byte buffer instead of building one big str
+        csv_buffer = io.BytesIO()
+        df_export.to_csv(csv_buffer, index=False, chunksize=5000, encoding='utf-8')
+        csv_buffer.seek(0)
         
         st.download_button(
             label="📥 Download as CSV",
-            data=csv,
+            data=csv_buffer,
             file_name=f"urban_maintenance_scans_{time.strftime('%Y%m%d_%H%M%S')}.csv",
             mime="text/csv"
         )
@@ -184,47 +337,17 @@ col1, col2 = st.columns([2, 1])
 with col1:
     st.header("🗺️ Interactive Map")
     
-    # Create map
-    m = folium.Map(location=st.session_state.map_center, zoom_start=st.session_state.map_zoom)
-    
-    # Add markers for existing scans
-    if st.session_state.scans:
-        for scan in st.session_state.scans:
-            try:
-                # Determine marker color based on issues
-                report = parse_llm_report(scan.get('llm_report_structured'))
-                issues = report.get('issues', [])
-                
-                if any(issue.get('severity') == 'High' for issue in issues):
-                    color = 'red'
-                    icon = 'exclamation-sign'
-                elif any(issue.get('severity') == 'Medium' for issue in issues):
-                    color = 'orange'
-                    icon = 'warning-sign'
-                elif issues:
-                    color = 'yellow'
-                    icon = 'info-sign'
-                else:
-                    color = 'green'
-                    icon = 'ok-sign'
-                
-                popup_text = f"""
-                <b>Scan {scan['id']}</b><br/>
-                Issues: {len(issues)}<br/>
-                {report.get('summary', '')[:100]}...
-                """
-                
-                folium.Marker(
-                    [scan['latitude'], scan['longitude']],
-                    popup=folium.Popup(popup_text, max_width=300),
-                    icon=folium.Icon(color=color, icon=icon),
-                    tooltip=f"Scan {scan['id']} - {len(issues)} issues"
-                ).add_to(m)
-            except Exception as e:
-                st.warning(f"Error adding marker for scan {scan.get('id', 'unknown')}: {e}")
+    # Markers for existing scans within the last reported viewport
+    visible_scans = filter_scans_in_bounds(st.session_state.scans, st.session_state.map_bounds)
+    scans_key = tuple((scan['id'], scan['_color'], len(scan['_issues'])) for scan in visible_scans)
     
-    # Add click functionality
-    m.add_child(folium.LatLngPopup())
+    # Create map (rebuilt only when the markers or viewport change)
+    m = build_scan_map(
+        scans_key,
+        tuple(st.session_state.map_center),
+        st.session_state.map_zoom,
+        visible_scans
+    )
     
     # Display map
     map_data = st_folium(m, width=700, height=500, key="main_map")
@@ -233,11 +356,14 @@ with col1:
     if map_data and map_data.get("last_clicked"):
         st.session_state.selected_lat = map_data["last_clicked"]["lat"]
         st.session_state.selected_lon = map_data["last_clicked"]["lng"]
-        st.session_state.map_center = [st.session_state.selected_lat, st.session_state.selected_lon]
+        recenter_map(st.session_state.selected_lat, st.session_state.selected_lon)
     
     if map_data and map_data.get("center"):
         st.session_state.map_center = [map_data["center"]["lat"], map_data["center"]["lng"]]
         st.session_state.map_zoom = map_data["zoom"]
+    
+    if map_data and map_data.get("bounds"):
+        st.session_state.map_bounds = map_data["bounds"]
 
 with col2:
     st.header("📍 Scan Location")
@@ -262,7 +388,7 @@ with col2:
         lat, lon = quick_locations[selected_city]
         st.session_state.selected_lat = lat
         st.session_state.selected_lon = lon
-        st.session_state.map_center = [lat, lon]
+        recenter_map(lat, lon)
     
     # Manual coordinate input
     st.subheader("📝 Manual Input")
@@ -284,11 +410,16 @@ with col2:
     if manual_lat != st.session_state.selected_lat or manual_lon != st.session_state.selected_lon:
         st.session_state.selected_lat = manual_lat
         st.session_state.selected_lon = manual_lon
-        st.session_state.map_center = [manual_lat, manual_lon]
+        recenter_map(manual_lat, manual_lon)
     
     # Scan button with enhanced feedback
     st.subheader("🚀 Start Scan")
     
+    force_rescan = st.checkbox(
+        "Rescan even if scanned recently",
+        help=f"Locations scanned in the last {SCAN_CACHE_TTL // 60} minutes are skipped unless this is checked"
+    )
+    
     if st.button("🔍 Scan Location", type="primary", width='stretch'):
         scan_container = st.container()
         
@@ -297,32 +428,34 @@ with col2:
             progress_bar = st.progress(0, text="Initializing scan...")
             status_text = st.empty()
             
+            def update_progress(percent, message):
+                """Reflect a pipeline milestone reported by the scanner"""
+                progress_bar.progress(percent, text=message)
+                status_text.text(message)
+            
             try:
-                status_text.text("📷 Fetching street view image...")
-                progress_bar.progress(20, text="Fetching street view image...")
-                time.sleep(0.5)  # Brief pause for UI feedback
-                
-                status_text.text("🔍 Analyzing with computer vision...")
-                progress_bar.progress(40, text="Analyzing with computer vision...")
-                time.sleep(0.5)
-                
-                status_text.text("🤖 Generating AI report...")
-                progress_bar.progress(60, text="Generating AI report...")
-                time.sleep(0.5)
+                # Execute the actual scan, driving progress from its real milestones
+                success = scan_main(
+                    st.session_state.selected_lat,
+                    st.session_state.selected_lon,
+                    progress_callback=update_progress,
+                    force=force_rescan
+                )
                 
-                status_text.text("☁️ Uploading to cloud storage...")
-                progress_bar.progress(80, text="Uploading to cloud storage...")
-                
-                # Execute the actual scan
-                success = scan_main(st.session_state.selected_lat, st.session_state.selected_lon)
-                
-                if success:
+                if success == RECENTLY_SCANNED:
+                    progress_bar.progress(100, text="Location recently scanned")
+                    status_text.text("♻️ No new scan stored")
+                    st.info(
+                        f"This location was scanned in the last {SCAN_CACHE_TTL // 60} minutes, so it wasn't scanned again. "
+                        "Check \"Rescan even if scanned recently\" to scan it anyway."
+                    )
+                elif success:
                     progress_bar.progress(100, text="Scan completed successfully!")
                     status_text.text("✅ Scan completed successfully!")
                     
                     # Refresh data and update UI
                     fetch_all_scans.clear()
-                    st.session_state.scans = fetch_all_scans()
+                    load_scans()
                     
                     if st.session_state.scans:
                         st.session_state.selected_scan_id = st.session_state.scans[0]['id']
@@ -351,18 +484,7 @@ else:
     # Scan selector
     scan_options = {}
     for scan in st.session_state.scans:
-        created_at = scan.get('created_at', 'Unknown time')
-        if 'T' in str(created_at):
-            try:
-                from datetime import datetime
-                dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                formatted_time = dt.strftime('%Y-%m-%d %H:%M')
-            except:
-                formatted_time = str(created_at)[:19]  # Take first 19 chars
-        else:
-            formatted_time = str(created_at)
-        
-        scan_options[f"Scan {scan['id']} - {formatted_time}"] = scan['id']
+        scan_options[f"Scan {scan['id']} - {scan['_formatted_time']}"] = scan['id']
     
     # Get default selection
     if st.session_state.selected_scan_id in [scan['id'] for scan in st.session_state.scans]:
@@ -386,40 +508,48 @@ else:
     if selected_scan:
         st.session_state.selected_scan_id = selected_scan_id
         
+        # Download each distinct image URL once, concurrently
+        image_url = selected_scan.get('image_url')
+        annotated_url = selected_scan.get('annotated_image_url')
+        image_urls = {url for url in (image_url, annotated_url) if url}
+        image_futures = {}
+        if image_urls:
+            with ThreadPoolExecutor(max_workers=len(image_urls)) as executor:
+                image_futures = {url: executor.submit(_fetch_image_bytes, url) for url in image_urls}
+        
+        image_future = image_futures.get(image_url)
+        annotated_future = image_futures.get(annotated_url) if annotated_url != image_url else None
+        
         # Display scan details
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("🖼️ Street View Image")
             try:
-                image_url = selected_scan.get('image_url')
-                if image_url:
-                    # Load image with error handling
-                    response = requests.get(image_url, timeout=10)
-                    if response.status_code == 200:
-                        image = Image.open(io.BytesIO(response.content))
-                        st.image(image, caption="Original Street View", width='stretch')
-                    else:
-                        st.error(f"Failed to load image (Status: {response.status_code})")
-                        st.write(f"Image URL: {image_url}")
+                if image_future:
+                    image = Image.open(io.BytesIO(image_future.result()))
+                    st.image(image, caption="Original Street View", width='stretch')
+                elif annotated_url:
+                    # Scans only keep the annotated frame unless KEEP_ORIGINAL=1 was set
+                    st.info("Original image not retained for this scan")
                 else:
                     st.warning("No image URL available")
+            except requests.HTTPError as e:
+                st.error(f"Failed to load image (Status: {e.response.status_code})")
+                st.write(f"Image URL: {image_url}")
             except Exception as e:
                 st.error(f"Could not load image: {e}")
         
         with col2:
             st.subheader("🎯 Annotated Image")
             try:
-                annotated_url = selected_scan.get('annotated_image_url')
-                if annotated_url and annotated_url != selected_scan.get('image_url'):
-                    response = requests.get(annotated_url, timeout=10)
-                    if response.status_code == 200:
-                        image = Image.open(io.BytesIO(response.content))
-                        st.image(image, caption="AI Detections", width='stretch')
-                    else:
-                        st.warning("Annotated image not available")
+                if annotated_future:
+                    image = Image.open(io.BytesIO(annotated_future.result()))
+                    st.image(image, caption="AI Detections", width='stretch')
                 else:
                     st.info("Annotated image same as original")
+            except requests.HTTPError:
+                st.warning("Annotated image not available")
             except Exception as e:
                 st.warning(f"Could not load annotated image: {e}")
         
@@ -434,21 +564,18 @@ else:
             st.metric("🔍 Objects Detected", detection_count)
         
         with col3:
-            report = parse_llm_report(selected_scan.get('llm_report_structured'))
-            issues_count = len(report.get('issues', []))
+            issues_count = len(selected_scan['_issues'])
             st.metric("⚠️ Issues Found", issues_count)
         
         # AI Analysis Report
         st.subheader("🤖 AI Analysis Report")
         
-        report = parse_llm_report(selected_scan.get('llm_report_structured'))
-        
         # Summary
-        summary = report.get('summary', 'No summary available')
+        summary = selected_scan['_summary'] or 'No summary available'
         st.write(f"**Summary:** {summary}")
         
         # Issues
-        issues = report.get('issues', [])
+        issues = selected_scan['_issues']
         if issues:
             st.write("**Identified Issues:**")
             
@@ -1,29 +1,60 @@
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
+from langchain_core.messages import SystemMessage
 from langchain_groq import ChatGroq
+from langchain_community.cache import SQLiteCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.output_parsers import StrOutputParser
 import json
-import ast
-import re
+import logging
+import orjson
 import os
+import copy
+import asyncio
+import hashlib
+import sqlite3
+import time
+from functools import lru_cache
+from typing import List
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
 from dotenv import load_dotenv
 from PIL import Image
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from io import BytesIO
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# --- Persistent LLM response cache (identical prompts skip the Groq round trip) ---
+set_llm_cache(SQLiteCache(database_path=os.getenv("LLM_CACHE_PATH", ".llm_cache.db")))
+
+# --- Exact report cache keyed by a hash of the canonicalized detections ---
+REPORT_CACHE_PATH = os.getenv("REPORT_CACHE_PATH", ".report_cache.db")
+REPORT_CACHE_TTL_DAYS = int(os.getenv("REPORT_CACHE_TTL_DAYS", "30"))
+
+# --- Pooled HTTP session for image downloads (keep-alive + retries on transient errors) ---
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
 # --- Initialize Groq LLM (Llama 3.1 8B Instant, fast + cheap) ---
 llm = ChatGroq(
     model="llama-3.1-8b-instant",
     api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.1
+    temperature=0.1,
+    # JSON mode makes Groq return a single well-formed JSON object
+    model_kwargs={"response_format": {"type": "json_object"}}
 )
 
 # --- Prompt Template ---
-prompt_template = """
-You are an expert urban planning and public works analyst. Your task is to review computer vision detection data from a street view image and identify potential public infrastructure issues.
-
-DETECTION DATA:
-{detections_json}
+# Static instructions go first as a byte-identical system message so providers
+# can reuse the cached prompt prefix; only the detections vary per request.
+STATIC_INSTRUCTIONS = """You are an expert urban planning and public works analyst. Your task is to review computer vision detection data from a street view image and identify potential public infrastructure issues.
 
 **Instructions:**
 
@@ -57,117 +88,132 @@ DETECTION DATA:
    - Traffic lights and signs in good condition
 
 **Output MUST be valid JSON only, in this exact schema:**
-{{
+{
   "summary": "A one-sentence overview that accurately reflects the issues array below.",
   "issues": [
-    {{
+    {
       "type": "issue_category",
       "severity": "High/Medium/Low",
       "description": "Specific description of the issue and its impact."
-    }}
+    }
   ]
-}}
+}
 
 **Examples:**
 
 If NO issues are found:
-{{
+{
   "summary": "No infrastructure issues detected in this urban scene.",
   "issues": []
-}}
+}
 
 If issues ARE found:
-{{
+{
   "summary": "Two infrastructure issues identified: a pothole requiring repair and faded road markings.",
   "issues": [
-    {{
+    {
       "type": "pothole",
-      "severity": "High", 
+      "severity": "High",
       "description": "Large pothole in road surface poses risk to vehicle damage and traffic safety."
-    }},
-    {{
+    },
+    {
       "type": "faded_marking",
       "severity": "Medium",
       "description": "Road lane markings are severely faded, potentially causing driver confusion."
-    }}
+    }
   ]
-}}
-
-Remember: BE CONSERVATIVE. Only report actual infrastructure problems, not normal urban elements.
-
-JSON Output:
-"""
-
-prompt = PromptTemplate(
-    input_variables=["detections_json"],
-    template=prompt_template,
-)
+}
+
+Remember: BE CONSERVATIVE. Only report actual infrastructure problems, not normal urban elements."""
+
+prompt = ChatPromptTemplate.from_messages([
+    SystemMessage(content=STATIC_INSTRUCTIONS),
+    HumanMessagePromptTemplate.from_template("DETECTION DATA:\n{detections_json}\n\nJSON Output:"),
+])
+
+# Use the recommended syntax instead of LLMChain; the parser yields plain text
+analysis_chain = prompt | llm | StrOutputParser()
+
+# --- Report Schema ---
+class Issue(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    type: str = "Unknown"
+    severity: str = "Unknown"
+    description: str = ""
+
+class Report(BaseModel):
+    summary: str
+    issues: List[Issue] = []
+
+    @field_validator("issues", mode="before")
+    @classmethod
+    def _drop_invalid_issues(cls, issues):
+        """Keeps the well-formed issues so one bad entry doesn't discard the whole report."""
+        if not isinstance(issues, list):
+            return issues
+        valid_issues = []
+        for issue in issues:
+            try:
+                valid_issues.append(Issue.model_validate(issue))
+            except ValidationError as e:
+                logger.debug("Dropping invalid issue %s: %s", issue, e)
+        return valid_issues
 
-# Use the recommended syntax instead of LLMChain
-analysis_chain = prompt | llm
+def _parse_report(text):
+    """Parses and validates a JSON report, returning None if it doesn't fit the schema."""
+    try:
+        return Report.model_validate_json(text).model_dump()
+    except ValidationError as e:
+        logger.debug("Report validation failed: %s", e)
+        return None
+
+class ReportParseError(ValueError):
+    """Raised when an LLM response doesn't contain a valid report."""
+
+def _extract_report(text):
+    """Extracts the report dict from LLM output, or returns None if there isn't one."""
+    # JSON mode guarantees a bare object, so this is the normal path
+    report = _parse_report(text)
+    if report is not None:
+        return report
+
+    # Non-JSON-mode output may still wrap the object in prose
+    start = text.find('{')
+    end = text.rfind('}')
+    if start != -1 and end > start:
+        return _parse_report(text[start:end + 1])
+    return None
+
+def _unparsed_report():
+    """Report returned when the LLM response couldn't be parsed."""
+    return {
+        "summary": "Could not parse AI analysis. The detection data may not contain recognizable infrastructure issues.",
+        "issues": []
+    }
 
-# --- JSON Extraction Helper ---
 def extract_report_dict(text: str):
     """
     Extract exactly one properly-formed JSON dict (with summary/issues).
     Always returns a valid dict.
     """
-    print(f"DEBUG: Raw LLM response: {text}")
-    
-    # Clean the text first
-    text = text.strip()
-    
-    # Try direct JSON parsing first
-    try:
-        parsed = json.loads(text)
-        if isinstance(parsed, dict) and "summary" in parsed and "issues" in parsed:
-            print("DEBUG: Successfully parsed direct JSON")
-            return parsed
-    except Exception as e:
-        print(f"DEBUG: Direct JSON parsing failed: {e}")
-
-    # Try to find JSON block in the text
-    json_patterns = [
-        r'\{[\s\S]*?"summary"[\s\S]*?"issues"[\s\S]*?\}',
-        r'\{[\s\S]*?\}',
-    ]
-    
-    for pattern in json_patterns:
-        matches = re.findall(pattern, text)
-        for match in matches:
-            try:
-                parsed = json.loads(match)
-                if isinstance(parsed, dict) and "summary" in parsed and "issues" in parsed:
-                    print("DEBUG: Successfully parsed JSON from regex match")
-                    return parsed
-            except Exception as e:
-                print(f"DEBUG: Regex JSON parsing failed: {e}")
-                # Try with ast.literal_eval as fallback
-                try:
-                    parsed = ast.literal_eval(match)
-                    if isinstance(parsed, dict) and "summary" in parsed and "issues" in parsed:
-                        print("DEBUG: Successfully parsed with ast.literal_eval")
-                        return parsed
-                except Exception as e2:
-                    print(f"DEBUG: AST parsing also failed: {e2}")
-                    continue
-
-    # If all parsing fails, try to extract at least the summary
-    summary_match = re.search(r'"summary":\s*"([^"]*)"', text)
-    if summary_match:
-        summary = summary_match.group(1)
-        print(f"DEBUG: Extracted partial summary: {summary}")
-        return {
-            "summary": summary,
-            "issues": []
-        }
+    report = _extract_report(text)
+    if report is not None:
+        return report
 
     # Ultimate fallback
-    print("DEBUG: All parsing methods failed, using fallback")
-    return {
-        "summary": "Could not parse AI analysis. The detection data may not contain recognizable infrastructure issues.",
-        "issues": []
-    }
+    logger.warning("All parsing methods failed, using fallback")
+    return _unparsed_report()
+
+@lru_cache(maxsize=1)
+def _get_fallback_detector():
+    """Builds the CPU DETR pipeline once and reuses it across calls."""
+    from transformers import pipeline
+
+    # Use CPU explicitly to avoid CUDA issues
+    return pipeline("object-detection", 
+                    model="facebook/detr-resnet-50",
+                    device=-1)  # -1 for CPU
 
 # Fallback object detection using Hugging Face Transformers
 def analyze_image_fallback(image_path, confidence_threshold=0.5):
@@ -175,12 +221,7 @@ def analyze_image_fallback(image_path, confidence_threshold=0.5):
     Fallback object detection using Hugging Face Transformers.
     """
     try:
-        from transformers import pipeline
-        
-        # Use CPU explicitly to avoid CUDA issues
-        object_detector = pipeline("object-detection", 
-                                  model="facebook/detr-resnet-50",
-                                  device=-1)  # -1 for CPU
+        object_detector = _get_fallback_detector()
 
         # Open and analyze the image
         image = Image.open(image_path)
@@ -202,14 +243,224 @@ def analyze_image_fallback(image_path, confidence_threshold=0.5):
             if detection['score'] >= confidence_threshold
         ]
         
-        print(f"DEBUG: Fallback detection found {len(filtered_results)} objects")
+        logger.debug("Fallback detection found %s objects", len(filtered_results))
         return filtered_results
         
     except Exception as e:
-        print(f"Error analyzing image with fallback model: {e}")
+        logger.error("Error analyzing image with fallback model: %s", e)
         return []
 
 # --- Main Report Generator ---
+def _empty_detections_report():
+    """Report returned when there is nothing for the LLM to analyze."""
+    return {
+        "summary": "No objects detected. This may be due to poor image quality or empty scene.",
+        "issues": []
+    }
+
+# COCO classes from DETR that never indicate an infrastructure problem on their
+# own. Vehicles, street furniture and any Grounding DINO phrase (which is never
+# a COCO class name) still go to the LLM.
+NON_INFRA_LABELS = frozenset({
+    "person", "bird", "cat", "dog", "horse", "sheep", "cow", "elephant", "bear",
+    "zebra", "giraffe", "backpack", "umbrella", "handbag", "tie", "suitcase",
+    "frisbee", "skis", "snowboard", "sports ball", "kite", "baseball bat",
+    "baseball glove", "skateboard", "surfboard", "tennis racket", "bottle",
+    "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut",
+    "cake", "chair", "couch", "potted plant", "bed", "dining table", "toilet",
+    "tv", "laptop", "mouse", "remote", "keyboard", "cell phone", "microwave",
+    "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase",
+    "scissors", "teddy bear", "hair drier", "toothbrush"
+})
+
+def _no_infra_report():
+    """Report returned when no detection could relate to public infrastructure."""
+    return {
+        "summary": "No infrastructure issues detected.",
+        "issues": []
+    }
+
+def _precomputed_report(detections):
+    """
+    Returns a canned report when the LLM call can be skipped, else None.
+
+    Args:
+        detections (list): Detection output from object detection model.
+
+    Returns:
+        dict or None: The report, or None if the detections need analysis.
+    """
+    detections = [detection for detection in detections if isinstance(detection, dict)]
+    if not detections:
+        return _empty_detections_report()
+    if all(str(detection.get("label", "")).lower() in NON_INFRA_LABELS for detection in detections):
+        return _no_infra_report()
+    return None
+
+def _chain_error_report(error):
+    """Report returned when the LLM chain call fails."""
+    return {
+        "summary": f"Error: LLM chain failed - {str(error)}", 
+        "issues": []
+    }
+
+def _prompt_detections(detections):
+    """
+    Label and 2-decimal score of each dict detection, as sent to the LLM.
+
+    Returns an empty list if any entry has a label or score that can't be
+    converted, so malformed input never raises.
+    """
+    try:
+        return [
+            {
+                "label": str(detection.get("label", "unknown")),
+                "score": round(float(detection.get("score", 0.0)), 2)
+            }
+            for detection in detections
+            if isinstance(detection, dict)
+        ]
+    except (TypeError, ValueError) as e:
+        logger.debug("Error formatting detections: %s", e)
+        return []
+
+def _format_detections_json(detections):
+    """
+    Normalizes detections and serializes them for the prompt.
+
+    Only labels and 2-decimal scores are sent; the analysis doesn't use box
+    coordinates, and leaving them out keeps the prompt suffix short.
+
+    Args:
+        detections (list): Detection output from object detection model.
+
+    Returns:
+        str: JSON string of the formatted detections.
+    """
+    formatted_detections = _prompt_detections(detections)
+
+    # Compact output keeps the per-request prompt suffix short; sorted keys give
+    # structurally identical detections the same cache key
+    detections_json = orjson.dumps(formatted_detections, option=orjson.OPT_SORT_KEYS).decode()
+    logger.debug("Formatted detections JSON: %s", detections_json)
+    return detections_json
+
+def _report_from_response(report_text):
+    """
+    Extracts and validates the structured report from an LLM chain response.
+
+    Args:
+        report_text (str): The text returned by the chain.
+
+    Returns:
+        dict: Parsed JSON report.
+
+    Raises:
+        ReportParseError: If the response holds no valid report; callers fall
+            back to _unparsed_report() without caching it.
+    """
+    logger.debug("Raw LLM response: %s", report_text)
+
+    # Extract the structured report and validate summary/issues agreement
+    result = _extract_report(report_text)
+    if result is None:
+        raise ReportParseError("Could not parse a report from the LLM response")
+    logger.debug("Final parsed result: %s", result)
+    if result['issues'] and 'no' in result['summary'].lower():
+        logger.warning("Summary/issues mismatch detected")
+        result['summary'] = f"Found {len(result['issues'])} infrastructure issues requiring attention."
+
+    return result
+
+def _detections_cache_key(detections):
+    """
+    Hashes a canonical form of the detections so near-identical scans share a key.
+
+    Detections are ordered by score and scores rounded to 2 decimals, which
+    absorbs the small jitter between repeated scans of the same location.
+    Boxes are left out, matching what the prompt sends to the LLM.
+    """
+    canonical = sorted(
+        _prompt_detections(detections),
+        key=lambda detection: (-detection["score"], detection["label"])
+    )
+    canon = orjson.dumps(canonical, option=orjson.OPT_SORT_KEYS).decode()
+    return hashlib.sha256(canon.encode()).hexdigest()
+
+def _report_cache_connect():
+    """Opens the report cache database, creating the table on first use."""
+    conn = sqlite3.connect(REPORT_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS report_cache ("
+        "prompt_hash TEXT PRIMARY KEY, response_text TEXT NOT NULL, "
+        "created_at REAL NOT NULL, ttl_days INTEGER NOT NULL)"
+    )
+    return conn
+
+def prepare_report_cache():
+    """
+    Creates the report cache table ahead of the first report.
+
+    The chain and its Groq client are built when this module is imported, so
+    with this the report path is fully set up before a batch starts.
+    """
+    try:
+        _report_cache_connect().close()
+    except sqlite3.Error as e:
+        logger.debug("Report cache setup failed: %s", e)
+
+def _report_cache_get(prompt_hash):
+    """Returns the cached report for a hash, or None when missing or expired."""
+    try:
+        conn = _report_cache_connect()
+        try:
+            row = conn.execute(
+                "SELECT response_text, created_at, ttl_days FROM report_cache WHERE prompt_hash = ?",
+                (prompt_hash,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.debug("Report cache lookup failed: %s", e)
+        return None
+
+    if row is None:
+        return None
+    response_text, created_at, ttl_days = row
+    if time.time() - created_at > ttl_days * 86400:
+        return None
+    return orjson.loads(response_text)
+
+def _report_cache_put(prompt_hash, report):
+    """Stores a successfully parsed report under its detections hash (never a fallback)."""
+    try:
+        conn = _report_cache_connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO report_cache VALUES (?, ?, ?, ?)",
+                    (prompt_hash, orjson.dumps(report).decode(), time.time(), REPORT_CACHE_TTL_DAYS)
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.debug("Report cache write failed: %s", e)
+
+@lru_cache(maxsize=512)
+def _generate_report_cached(detections_json):
+    """
+    Invokes the chain for a canonical detections JSON string.
+
+    Groq's JSON mode doesn't stream and already returns a single object, so a
+    plain invoke is used (which also goes through the SQLite LLM cache).
+    Failures, including unparseable responses, raise instead of returning,
+    so they are never memoized.
+    """
+    logger.debug("Invoking LLM chain")
+    response = analysis_chain.invoke({"detections_json": detections_json})
+    return _report_from_response(response)
+
 def generate_report(detections):
     """
     Generates a structured JSON report from detection results.
@@ -220,69 +471,135 @@ def generate_report(detections):
     Returns:
         dict: Parsed JSON report.
     """
-    print(f"DEBUG: generate_report called with {len(detections)} detections")
+    logger.debug("generate_report called with %d detections", len(detections))
     
-    if not detections:
-        print("DEBUG: No detections provided")
-        return {
-            "summary": "No objects detected. This may be due to poor image quality or empty scene.",
-            "issues": []
-        }
-
-    # Ensure detections are properly formatted
-    formatted_detections = []
-    for detection in detections:
-        try:
-            formatted_detection = {
-                "label": str(detection.get("label", "unknown")),
-                "score": float(detection.get("score", 0.0)),
-                "box": detection.get("box", {})
-            }
-            formatted_detections.append(formatted_detection)
-        except Exception as e:
-            print(f"DEBUG: Error formatting detection: {e}")
-            continue
+    precomputed = _precomputed_report(detections)
+    if precomputed is not None:
+        logger.debug("No infrastructure-relevant detections, skipping LLM call")
+        return precomputed
+
+    prompt_hash = _detections_cache_key(detections)
+    cached = _report_cache_get(prompt_hash)
+    if cached is not None:
+        logger.debug("Report cache hit, skipping LLM call")
+        return cached
 
-    detections_json = json.dumps(formatted_detections, indent=2)
-    print(f"DEBUG: Formatted detections JSON: {detections_json}")
+    detections_json = _format_detections_json(detections)
 
     try:
-        # Invoke the chain
-        print("DEBUG: Invoking LLM chain...")
-        response = analysis_chain.invoke({"detections_json": detections_json})
+        # Callers may mutate the report, so hand out a copy of the memoized one
+        report = copy.deepcopy(_generate_report_cached(detections_json))
+        _report_cache_put(prompt_hash, report)
+        return report
         
-        # Extract content from response
-        if hasattr(response, 'content'):
-            report_text = response.content
+    except ReportParseError as e:
+        logger.warning("%s, using fallback", e)
+        return _unparsed_report()
+    except Exception as e:
+        logger.error("Error invoking LLM chain: %s", e)
+        return _chain_error_report(e)
+
+async def generate_report_async(detections):
+    """
+    Async variant of generate_report that awaits the LLM without blocking the event loop.
+
+    Args:
+        detections (list): Detection output from object detection model.
+
+    Returns:
+        dict: Parsed JSON report.
+    """
+    precomputed = _precomputed_report(detections)
+    if precomputed is not None:
+        return precomputed
+
+    prompt_hash = _detections_cache_key(detections)
+    cached = _report_cache_get(prompt_hash)
+    if cached is not None:
+        return cached
+
+    detections_json = _format_detections_json(detections)
+
+    try:
+        response = await analysis_chain.ainvoke({"detections_json": detections_json})
+        report = _report_from_response(response)
+        _report_cache_put(prompt_hash, report)
+        return report
+    except ReportParseError as e:
+        logger.warning("%s, using fallback", e)
+        return _unparsed_report()
+    except Exception as e:
+        logger.error("Error invoking LLM chain: %s", e)
+        return _chain_error_report(e)
+
+async def generate_reports_async(detections_list, max_concurrency=16):
+    """
+    Generates reports for several detection sets concurrently.
+
+    Args:
+        detections_list (list): Detection outputs, one list per image.
+        max_concurrency (int): Maximum number of LLM calls in flight at once.
+
+    Returns:
+        list: Parsed JSON reports, in the same order as the input.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate_one(detections):
+        async with semaphore:
+            return await generate_report_async(detections)
+
+    return await asyncio.gather(*(generate_one(detections) for detections in detections_list))
+
+def generate_reports(detections_list):
+    """
+    Generates structured JSON reports for several detection sets in one batch.
+
+    The LLM requests are dispatched together through the chain's native
+    batching, sharing one client instead of paying a round trip per scan.
+
+    Args:
+        detections_list (list): Detection outputs, one list per image.
+
+    Returns:
+        list: Parsed JSON reports, in the same order as the input.
+    """
+    logger.debug("generate_reports called with %d detection sets", len(detections_list))
+
+    reports = [None] * len(detections_list)
+    pending = []  # (position, detections_json) pairs that need the LLM
+    for i, detections in enumerate(detections_list):
+        precomputed = _precomputed_report(detections)
+        if precomputed is None:
+            pending.append((i, _format_detections_json(detections)))
         else:
-            report_text = str(response)
-            
-        print(f"DEBUG: LLM response received: {report_text[:200]}...")
-        
-        # Extract and return the structured report
-        result = extract_report_dict(report_text)
-        print(f"DEBUG: Final parsed result: {result}")
-
-        # After getting the LLM response, add this:
-        print(f"DEBUG: Raw LLM Response:")
-        print("="*50)
-        print(report_text)
-        print("="*50)
-
-        # Also add validation after parsing:
-        result = extract_report_dict(report_text)
-        if result['issues'] and 'no' in result['summary'].lower():
-            print("WARNING: Summary/issues mismatch detected!")
-            result['summary'] = f"Found {len(result['issues'])} infrastructure issues requiring attention."
-
-        return result
-        
+            reports[i] = precomputed
+
+    if not pending:
+        return reports
+
+    try:
+        logger.debug("Invoking LLM chain in batch of %d", len(pending))
+        responses = analysis_chain.batch(
+            [{"detections_json": detections_json} for _, detections_json in pending],
+            return_exceptions=True
+        )
     except Exception as e:
-        print(f"⚠️ Error invoking LLM chain: {e}")
-        return {
-            "summary": f"Error: LLM chain failed - {str(e)}", 
-            "issues": []
-        }
+        logger.error("Error invoking LLM chain batch: %s", e)
+        responses = [e] * len(pending)
+
+    for (i, _), response in zip(pending, responses):
+        if isinstance(response, Exception):
+            logger.error("Error invoking LLM chain: %s", response)
+            reports[i] = _chain_error_report(response)
+        else:
+            try:
+                reports[i] = _report_from_response(response)
+            except ReportParseError as e:
+                logger.warning("%s, using fallback", e)
+                reports[i] = _unparsed_report()
+
+    return reports
 
 # --- Image Analysis Function ---
 def analyze_image(image_path, confidence_threshold=0.5):
@@ -290,7 +607,7 @@ def analyze_image(image_path, confidence_threshold=0.5):
     Main function to analyze images. Uses fallback method since Grounding DINO
     requires specific setup that might not be available in all environments.
     """
-    print(f"DEBUG: analyze_image called with {image_path}")
+    logger.debug("analyze_image called with %s", image_path)
     return analyze_image_fallback(image_path, confidence_threshold)
 
 # --- Draw Bounding Boxes Function ---
@@ -299,19 +616,10 @@ def draw_bounding_boxes(image_path, detections, output_path="annotated_image.jpg
     Draws bounding boxes on the image and saves it.
     """
     try:
-        from PIL import Image, ImageDraw, ImageFont
-        
-        image = Image.open(image_path)
-        draw = ImageDraw.Draw(image)
-        
-        # Try to load a font, fall back to default if not available
-        try:
-            font = ImageFont.truetype("arial.ttf", 15)
-        except:
-            try:
-                font = ImageFont.load_default()
-            except:
-                font = None
+        import cv2
+        import numpy as np
+
+        arr = np.array(Image.open(image_path).convert("RGB"))
 
         for detection in detections:
             try:
@@ -326,28 +634,26 @@ def draw_bounding_boxes(image_path, detections, output_path="annotated_image.jpg
                 ymax = int(box['ymax'])
 
                 # Draw rectangle
-                draw.rectangle([(xmin, ymin), (xmax, ymax)], outline="red", width=3)
-                
-                # Draw label
+                cv2.rectangle(arr, (xmin, ymin), (xmax, ymax), (255, 0, 0), 3)
+
+                # Draw label with background
                 text = f"{label} {score:.2f}"
-                if font:
-                    # Calculate text size for background
-                    bbox = draw.textbbox((xmin, ymin), text, font=font)
-                    draw.rectangle(bbox, fill="red")
-                    draw.text((xmin, ymin), text, fill="white", font=font)
-                else:
-                    draw.text((xmin, ymin), text, fill="red")
-                    
+                (text_w, text_h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+                text_top = max(0, ymin - text_h - baseline)
+                cv2.rectangle(arr, (xmin, text_top), (xmin + text_w, text_top + text_h + baseline), (255, 0, 0), cv2.FILLED)
+                cv2.putText(arr, text, (xmin, text_top + text_h), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                            (255, 255, 255), 1, cv2.LINE_AA)
+
             except Exception as e:
-                print(f"Error drawing detection {detection}: {e}")
+                logger.debug("Error drawing detection %s: %s", detection, e)
                 continue
 
-        image.save(output_path)
-        print(f"Annotated image saved to {output_path}")
+        Image.fromarray(arr).save(output_path)
+        logger.debug("Annotated image saved to %s", output_path)
         return True
         
     except Exception as e:
-        print(f"Error drawing bounding boxes: {e}")
+        logger.error("Error drawing bounding boxes: %s", e)
         return False
 
 # --- Debugging run ---
@@ -368,7 +674,8 @@ if __name__ == "__main__":
     try:
         # Download a test image
         test_image_url = "https://www.unionmutual.com/wp-content/uploads/2016/07/Potholes-resized-for-blog.jpg"
-        response = requests.get(test_image_url)
+        response = _SESSION.get(test_image_url, timeout=(3, 10))
+        response.raise_for_status()
         test_image_path = "test_street_view.jpg"
         
         with open(test_image_path, "wb") as f:
@@ -1,163 +1,278 @@
 from transformers import pipeline
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
+from io import BytesIO
 import os
 import torch
 import numpy as np
+import cv2
+import logging
+import threading
+from functools import lru_cache, wraps
 
 import sys
 import os
 sys.path.append(os.path.join(os.getcwd(), "GroundingDINO"))
 
+logger = logging.getLogger(__name__)
+
 # Grounding DINO imports
 try:
-    from groundingdino.util.inference import load_model, load_image, predict
+    from groundingdino.util.inference import load_model, predict
+    import groundingdino.datasets.transforms as T
     import torch
     has_dino = True
-    print("Grounding DINO successfully imported")
+    logger.debug("Grounding DINO successfully imported")
 except ImportError:
-    print("Grounding DINO not installed. Only Facebook DETR will be used.")
+    logger.info("Grounding DINO not installed. Only Facebook DETR will be used.")
     has_dino = False
 
-def analyze_image_combined(image_path, confidence_threshold=0.3, text_queries=None):
+DETR_MODEL = "facebook/detr-resnet-50"
+
+# Resolved once at import rather than on every analysis call
+DETR_DEVICE = 0 if torch.cuda.is_available() else -1
+DETR_TORCH_DEVICE = torch.device("cuda" if DETR_DEVICE >= 0 else "cpu")
+# Half precision and compilation only pay off on GPU; CPU stays in FP32 eager mode
+DETR_DTYPE = torch.float16 if DETR_DEVICE >= 0 else torch.float32
+
+def _compile_for_gpu(model):
+    """Wraps a model with torch.compile on CUDA, returning it unchanged on CPU."""
+    if DETR_TORCH_DEVICE.type != "cuda":
+        return model
+    return torch.compile(model, mode="reduce-overhead", fullgraph=False)
+
+# Held while a model loads, so concurrent first calls (e.g. from several CV
+# workers) wait for one load instead of each loading their own copy
+_model_load_lock = threading.RLock()
+
+def _load_once(func):
+    """Memoizes a model loader, serializing calls so a model is only loaded once."""
+    cached = lru_cache(maxsize=None)(func)
+
+    @wraps(func)
+    def wrapper(*args):
+        with _model_load_lock:
+            return cached(*args)
+
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+@_load_once
+def _get_detr_model():
+    """Loads the DETR processor and model once; the pipeline and batched path share them."""
+    from transformers import DetrImageProcessor, DetrForObjectDetection
+
+    logger.debug("Loading %s processor and model...", DETR_MODEL)
+    processor = DetrImageProcessor.from_pretrained(DETR_MODEL)
+    model = DetrForObjectDetection.from_pretrained(DETR_MODEL)
+    model = model.to(DETR_TORCH_DEVICE, dtype=DETR_DTYPE).eval()
+    return processor, _compile_for_gpu(model)
+
+@_load_once
+def _get_detector():
+    """Wraps the shared DETR model in an object-detection pipeline once and reuses it."""
+    processor, model = _get_detr_model()
+    # The pipeline needs the plain module; torch.compile keeps it as _orig_mod
+    detector = pipeline(
+        "object-detection",
+        model=getattr(model, "_orig_mod", model),
+        image_processor=processor,
+        device=DETR_DEVICE
+    )
+    detector.model = model
+    return detector
+
+def _detr_result_to_detections(result, id2label):
+    """Converts one post-processed DETR result into our detection dict format."""
+    return [
+        {
+            "label": id2label[label.item()],
+            "score": float(score),
+            "box": {
+                "xmin": int(box[0]),
+                "ymin": int(box[1]),
+                "xmax": int(box[2]),
+                "ymax": int(box[3])
+            }
+        }
+        for score, label, box in zip(result["scores"], result["labels"], result["boxes"])
+    ]
+
+# Default Grounding DINO queries, joined once into the caption the model expects
+DINO_TEXT_QUERIES = (
+    "pothole", "crack in road", "faded road marking", "damaged sidewalk",
+    "overgrown vegetation", "broken street light", "damaged traffic sign",
+    "damaged utility pole", "road obstruction", "safety hazard",
+    "damaged bench", "truck", "traffic congestion",
+    "standing water", "damaged barrier", "exposed wires", "illegal parking",
+    "construction zone", "damaged curb", "broken pavement"
+)
+DINO_CAPTION = ". ".join(DINO_TEXT_QUERIES) + "."
+DINO_CONFIG_PATH = "GroundingDINO/groundingdino/config/GroundingDINO_SwinT_OGC.py"
+
+@_load_once
+def _get_dino_model(config_path, checkpoint_path):
+    """Loads the Grounding DINO model once per checkpoint and reuses it."""
+    logger.debug("Loading Grounding DINO from %s...", checkpoint_path)
+    return load_model(config_path, checkpoint_path, device=DETR_TORCH_DEVICE.type)
+
+# Grounding DINO checkpoint locations, in the order they are tried
+DINO_CHECKPOINT_PATHS = (
+    "GroundingDINO/weights/groundingdino_swint_ogc.pth",
+    "weights/groundingdino_swint_ogc.pth",
+    "groundingdino_swint_ogc.pth",
+    "GroundingDINO/groundingdino_swint_ogc.pth"
+)
+
+def _find_dino_checkpoint():
+    """Returns the first Grounding DINO checkpoint found on disk, or None."""
+    return next((path for path in DINO_CHECKPOINT_PATHS if os.path.exists(path)), None)
+
+def load_models():
     """
-    Combines Facebook DETR and Grounding DINO for urban infrastructure detection.
-    
+    Loads DETR, and Grounding DINO when it is installed with a checkpoint,
+    so the first analysis doesn't pay for it.
+    """
+    _get_detector()
+    if has_dino:
+        checkpoint_path = _find_dino_checkpoint()
+        if checkpoint_path:
+            _get_dino_model(DINO_CONFIG_PATH, checkpoint_path)
+
+def load_rgb_image(image):
+    """
+    Returns an RGB PIL image, decoding only when given a path, file or bytes.
+
     Args:
-        image_path (str): Path to the image.
-        confidence_threshold (float): Minimum confidence for detections.
-        text_queries (list): List of text queries for Grounding DINO.
-    
+        image (str, bytes, file-like or PIL.Image.Image): Path to the image,
+            encoded image data, or an opened image.
+
     Returns:
-        list: Unified detection results.
+        PIL.Image.Image: The decoded RGB image.
     """
-    print(f"DEBUG: analyze_image_combined called with {image_path}")
-    combined_detections = []
+    if isinstance(image, Image.Image):
+        return image if image.mode == "RGB" else image.convert("RGB")
+    if isinstance(image, (bytes, bytearray)):
+        image = BytesIO(image)
+    return Image.open(image).convert("RGB")
 
-    # --- 1. Facebook DETR Detection ---
+def _load_dino_image(image):
+    """Resizes and normalizes a decoded image into the tensor Grounding DINO's predict expects."""
+    transform = T.Compose([
+        T.RandomResize([800], max_size=1333),
+        T.ToTensor(),
+        T.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
+    ])
+    image_transformed, _ = transform(image, None)
+    return image_transformed
+
+def _detect_detr(image, confidence_threshold):
+    """Runs Facebook DETR on a decoded image, falling back to the raw model if the pipeline fails."""
+    detections = []
     try:
-        print("DEBUG: Loading Facebook DETR...")
-        object_detector = pipeline(
-            "object-detection",
-            model="facebook/detr-resnet-50",
-            device=0 if torch.cuda.is_available() else -1
-        )
-        
-        print("DEBUG: Opening image...")
-        image = Image.open(image_path)
+        logger.debug("Loading Facebook DETR...")
+        object_detector = _get_detector()
         
-        print("DEBUG: Running DETR detection...")
+        logger.debug("Running DETR detection...")
         fb_results = object_detector(image)
-        print(f"DEBUG: DETR found {len(fb_results)} raw detections")
+        logger.debug("DETR found %s raw detections", len(fb_results))
 
-        fb_filtered = []
-        for r in fb_results:
-            try:
-                if r["score"] >= confidence_threshold:
-                    detection = {
-                        "label": r["label"],
-                        "score": float(r["score"]),
-                        "box": {
-                            "xmin": int(r["box"]["xmin"]),
-                            "ymin": int(r["box"]["ymin"]),
-                            "xmax": int(r["box"]["xmax"]),
-                            "ymax": int(r["box"]["ymax"])
-                        }
-                    }
-                    fb_filtered.append(detection)
-            except Exception as e:
-                print(f"DEBUG: Error processing DETR result {r}: {e}")
-                continue
+        fb_filtered = [
+            {
+                "label": r["label"],
+                "score": float(r["score"]),
+                "box": {
+                    "xmin": int(r["box"]["xmin"]),
+                    "ymin": int(r["box"]["ymin"]),
+                    "xmax": int(r["box"]["xmax"]),
+                    "ymax": int(r["box"]["ymax"])
+                }
+            }
+            for r in fb_results
+            if r["score"] >= confidence_threshold
+        ]
                 
-        print(f"DEBUG: DETR filtered to {len(fb_filtered)} detections above threshold")
-        combined_detections.extend(fb_filtered)
+        logger.debug("DETR filtered to %s detections above threshold", len(fb_filtered))
+        detections.extend(fb_filtered)
         
     except Exception as e:
-        print(f"Facebook DETR detection failed: {e}")
+        logger.warning("Facebook DETR detection failed: %s", e)
         # Try fallback if DETR fails
         try:
-            print("DEBUG: Trying simplified DETR approach...")
-            from transformers import DetrImageProcessor, DetrForObjectDetection
-            import torch
-            
-            processor = DetrImageProcessor.from_pretrained("facebook/detr-resnet-50")
-            model = DetrForObjectDetection.from_pretrained("facebook/detr-resnet-50")
+            logger.debug("Trying simplified DETR approach...")
+            processor, model = _get_detr_model()
             
-            image = Image.open(image_path)
-            inputs = processor(images=image, return_tensors="pt")
-            outputs = model(**inputs)
+            inputs = processor(images=image, return_tensors="pt").to(DETR_TORCH_DEVICE, dtype=DETR_DTYPE)
+            with torch.inference_mode():
+                outputs = model(**inputs)
             
             # Convert outputs to COCO API
             target_sizes = torch.tensor([image.size[::-1]])
             results = processor.post_process_object_detection(outputs, target_sizes=target_sizes, threshold=confidence_threshold)[0]
             
-            for score, label, box in zip(results["scores"], results["labels"], results["boxes"]):
-                combined_detections.append({
-                    "label": model.config.id2label[label.item()],
-                    "score": float(score),
-                    "box": {
-                        "xmin": int(box[0]),
-                        "ymin": int(box[1]),
-                        "xmax": int(box[2]),
-                        "ymax": int(box[3])
-                    }
-                })
-            print(f"DEBUG: Fallback DETR found {len(results['scores'])} detections")
+            detections.extend(_detr_result_to_detections(results, model.config.id2label))
+            logger.debug("Fallback DETR found %s detections", len(results['scores']))
             
         except Exception as e2:
-            print(f"Fallback DETR also failed: {e2}")
+            logger.error("Fallback DETR also failed: %s", e2)
+
+    return detections
+
+def analyze_image_combined(image_path, confidence_threshold=0.3, text_queries=None, detr_detections=None):
+    """
+    Combines Facebook DETR and Grounding DINO for urban infrastructure detection.
+    
+    Args:
+        image_path (str or PIL.Image.Image): Path to the image, or an already
+            decoded image so it isn't read from disk again.
+        confidence_threshold (float): Minimum confidence for detections.
+        text_queries (list): List of text queries for Grounding DINO.
+        detr_detections (list): DETR results already computed for this image
+            (e.g. by a batched pass); skips running DETR again.
+    
+    Returns:
+        list: Unified detection results.
+    """
+    logger.debug("analyze_image_combined called with %s", image_path)
+    combined_detections = []
+
+    # Decode once; every detector below shares this image
+    try:
+        image = load_rgb_image(image_path)
+    except Exception as e:
+        logger.error("Error opening image: %s", e)
+        return combined_detections
+
+    # --- 1. Facebook DETR Detection ---
+    if detr_detections is not None:
+        combined_detections.extend(detr_detections)
+    else:
+        combined_detections.extend(_detect_detr(image, confidence_threshold))
 
     # --- 2. Grounding DINO Detection ---
     if has_dino:
         try:
-            print("DEBUG: Attempting Grounding DINO detection...")
-            # Check if model file exists
-            model_config_path = "GroundingDINO/weights/groundingdino_swint_ogc.pth"
-            
-            if not os.path.exists(model_config_path):
-                print(f"DEBUG: Model file not found at {model_config_path}")
-                # Try alternative paths
-                alt_paths = [
-                    "weights/groundingdino_swint_ogc.pth",
-                    "groundingdino_swint_ogc.pth",
-                    "GroundingDINO/groundingdino_swint_ogc.pth"
-                ]
-                
-                for alt_path in alt_paths:
-                    if os.path.exists(alt_path):
-                        model_config_path = alt_path
-                        break
-                else:
-                    print("DEBUG: No Grounding DINO model file found, skipping...")
-                    raise FileNotFoundError("Model file not found")
+            logger.debug("Attempting Grounding DINO detection...")
+            model_config_path = _find_dino_checkpoint()
+            if model_config_path is None:
+                logger.debug("No Grounding DINO model file found, skipping...")
+                raise FileNotFoundError("Model file not found")
 
             # Load model
-            config_path = "GroundingDINO/groundingdino/config/GroundingDINO_SwinT_OGC.py"
-            model = load_model(config_path, model_config_path)
+            model = _get_dino_model(DINO_CONFIG_PATH, model_config_path)
             
-            dino_image, _ = load_image(image_path)
-
-            if text_queries is None:
-                text_queries = [
-                    "pothole", "crack in road", "faded road marking", "damaged sidewalk",
-                    "overgrown vegetation", "broken street light", "damaged traffic sign",
-                    "damaged utility pole", "road obstruction", "safety hazard",
-                    "damaged bench", "truck", "traffic congestion",
-                    "standing water", "damaged barrier", "exposed wires", "illegal parking",
-                    "construction zone", "damaged curb", "broken pavement"
-                ]
-
-            text_prompt = ". ".join(text_queries) + "."
+            text_prompt = DINO_CAPTION if text_queries is None else ". ".join(text_queries) + "."
             
             boxes, logits, phrases = predict(
                 model=model,
-                image=dino_image,
+                image=_load_dino_image(image),
                 caption=text_prompt,
                 box_threshold=confidence_threshold,
-                text_threshold=0.25
+                text_threshold=0.25,
+                device=DETR_TORCH_DEVICE.type
             )
 
             # Convert to our format
-            h, w, _ = dino_image.shape
+            w, h = image.size
             for box, logit, phrase in zip(boxes, logits, phrases):
                 # Convert normalized coordinates to pixel coordinates
                 x_center, y_center, width, height = box
@@ -177,144 +292,238 @@ def analyze_image_combined(image_path, confidence_threshold=0.3, text_queries=No
                     }
                 })
 
-            print(f"DEBUG: Grounding DINO found {len(boxes)} detections")
+            logger.debug("Grounding DINO found %s detections", len(boxes))
 
         except Exception as e:
-            print(f"Grounding DINO detection failed: {e}")
+            logger.warning("Grounding DINO detection failed: %s", e)
 
     # --- 3. Remove Duplicate Detections ---
-    def iou(box1, box2):
-        """Calculate Intersection over Union of two boxes"""
-        try:
-            x1 = max(box1['xmin'], box2['xmin'])
-            y1 = max(box1['ymin'], box2['ymin'])
-            x2 = min(box1['xmax'], box2['xmax'])
-            y2 = min(box1['ymax'], box2['ymax'])
-            
-            if x2 <= x1 or y2 <= y1:
-                return 0.0
-                
-            inter_area = (x2 - x1) * (y2 - y1)
-            box1_area = (box1['xmax'] - box1['xmin']) * (box1['ymax'] - box1['ymin'])
-            box2_area = (box2['xmax'] - box2['xmin']) * (box2['ymax'] - box2['ymin'])
-            union_area = box1_area + box2_area - inter_area
-            
-            return inter_area / (union_area + 1e-6)
-        except Exception as e:
-            print(f"DEBUG: Error calculating IoU: {e}")
-            return 0.0
+    logger.debug("Removing duplicates from %s total detections...", len(combined_detections))
+    final_detections = deduplicate_detections(combined_detections)
 
-    print(f"DEBUG: Removing duplicates from {len(combined_detections)} total detections...")
-    final_detections = []
-    
-    for det in combined_detections:
-        keep = True
-        for i, existing in enumerate(final_detections):
-            try:
-                # Check if labels are similar and IoU is high
-                if (det['label'].lower() == existing['label'].lower() or 
-                    any(word in det['label'].lower() for word in existing['label'].lower().split()) or
-                    any(word in existing['label'].lower() for word in det['label'].lower().split())):
-                    
-                    if iou(det['box'], existing['box']) > 0.5:
-                        # Keep the one with higher score
-                        if det['score'] > existing['score']:
-                            final_detections[i] = det
-                        keep = False
-                        break
-            except Exception as e:
-                print(f"DEBUG: Error comparing detections: {e}")
-                continue
-                
-        if keep:
-            final_detections.append(det)
-
-    print(f"DEBUG: Final detection count after deduplication: {len(final_detections)}")
+    logger.debug("Final detection count after deduplication: %s", len(final_detections))
     return final_detections
 
+def pairwise_iou(boxes):
+    """
+    Computes the IoU between every pair of boxes in one broadcast pass.
+
+    Args:
+        boxes (np.ndarray): (N, 4) array of xmin, ymin, xmax, ymax.
+
+    Returns:
+        np.ndarray: (N, N) float32 IoU matrix.
+    """
+    boxes = np.ascontiguousarray(boxes, dtype=np.float32)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    xx1 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+    yy1 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+    xx2 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+    yy2 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+    inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+    return inter / (areas[:, None] + areas[None, :] - inter + 1e-6)
+
+def deduplicate_detections(detections, iou_threshold=0.5):
+    """
+    Removes duplicate detections with greedy, score-ordered non-maximum suppression.
+
+    A detection is dropped when it overlaps a higher-scoring detection with a
+    similar label by more than iou_threshold IoU. The full IoU matrix is
+    computed once up front, and labels are similar when they match or share
+    a word.
+
+    Args:
+        detections (list): Detection results (label, score, box).
+        iou_threshold (float): IoU above which similar detections are duplicates.
+
+    Returns:
+        list: The kept detections, in their original order.
+    """
+    if not detections:
+        return []
+
+    try:
+        boxes = np.array(
+            [[d['box']['xmin'], d['box']['ymin'], d['box']['xmax'], d['box']['ymax']] for d in detections],
+            dtype=np.float32
+        )
+        scores = np.array([d['score'] for d in detections], dtype=np.float32)
+    except Exception as e:
+        logger.debug("Error preparing detections for deduplication: %s", e)
+        return list(detections)
+
+    # Normalize labels once so each comparison is a set intersection
+    labels = [str(d['label']).lower() for d in detections]
+    label_tokens = [frozenset(label.split()) for label in labels]
+
+    iou_matrix = pairwise_iou(boxes)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        # Overlapping boxes only count as duplicates when their labels are similar
+        duplicate = iou_matrix[i, rest] > iou_threshold
+        if duplicate.any():
+            duplicate[duplicate] = [
+                labels[i] == labels[j] or not label_tokens[i].isdisjoint(label_tokens[j])
+                for j in rest[duplicate]
+            ]
+        order = rest[~duplicate]
+
+    return [detections[i] for i in sorted(keep)]
+
+def _detr_batch(images, confidence_threshold):
+    """Runs DETR over decoded images in one forward pass; raises on failure."""
+    processor, model = _get_detr_model()
+
+    inputs = processor(images=images, return_tensors="pt").to(DETR_TORCH_DEVICE, dtype=DETR_DTYPE)
+    with torch.inference_mode():
+        outputs = model(**inputs)
+
+    target_sizes = torch.tensor([image.size[::-1] for image in images])
+    results = processor.post_process_object_detection(outputs, target_sizes=target_sizes, threshold=confidence_threshold)
+    return [_detr_result_to_detections(result, model.config.id2label) for result in results]
+
+def analyze_images_batch(image_paths, confidence_threshold=0.3):
+    """
+    Runs Facebook DETR over several images in a single batched forward pass.
+
+    The processor resizes and pads the images into one tensor, so the model
+    runs once per batch instead of once per image.
+
+    Args:
+        image_paths (list): Paths to the images, encoded image bytes, or
+            decoded PIL images.
+        confidence_threshold (float): Minimum confidence for detections.
+
+    Returns:
+        list: One list of detection results per image, in input order
+            (empty lists if the batch fails).
+    """
+    logger.debug("analyze_images_batch called with %s images", len(image_paths))
+    if not image_paths:
+        return []
+
+    try:
+        images = [load_rgb_image(image) for image in image_paths]
+        batch_detections = _detr_batch(images, confidence_threshold)
+        logger.debug("Batched DETR found %s detections", sum(len(d) for d in batch_detections))
+        return batch_detections
+
+    except Exception as e:
+        logger.error("Batched DETR detection failed: %s", e)
+        return [[] for _ in image_paths]
+
+def analyze_images_combined_batch(images, confidence_threshold=0.3, text_queries=None):
+    """
+    Batched counterpart of analyze_image_combined.
+
+    DETR runs once over the whole batch; Grounding DINO and deduplication then
+    run per image. If the batched pass fails, each image falls back to its own
+    DETR run, so results match analyze_image_combined either way.
+
+    Args:
+        images (list): Decoded PIL images (see load_rgb_image).
+        confidence_threshold (float): Minimum confidence for detections.
+        text_queries (list): List of text queries for Grounding DINO.
+
+    Returns:
+        list: One list of unified detection results per image, in input order.
+    """
+    if not images:
+        return []
+
+    try:
+        batch_detr = _detr_batch(images, confidence_threshold)
+        logger.debug("Batched DETR over %s images found %s detections", len(images), sum(len(d) for d in batch_detr))
+    except Exception as e:
+        logger.warning("Batched DETR detection failed, running per image: %s", e)
+        batch_detr = [None] * len(images)
+
+    return [
+        analyze_image_combined(image, confidence_threshold, text_queries, detr_detections=detr)
+        for image, detr in zip(images, batch_detr)
+    ]
+
+# RGB box colors, cycled per detection
+BOX_COLORS = [
+    (255, 0, 0),      # red
+    (0, 0, 255),      # blue
+    (0, 128, 0),      # green
+    (255, 255, 0),    # yellow
+    (128, 0, 128),    # purple
+    (255, 165, 0),    # orange
+    (0, 255, 255),    # cyan
+    (255, 0, 255),    # magenta
+]
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+LABEL_FONT_SCALE = 0.5
+LABEL_THICKNESS = 1
+
 def draw_bounding_boxes(image_path, detections, output_path="annotated_image.jpg"):
     """
     Draws bounding boxes on the image and saves it.
 
+    All boxes and labels are drawn with OpenCV into a single NumPy buffer.
+
     Args:
-        image_path (str): Path to the original image.
+        image_path (str or PIL.Image.Image): Path to the original image, or the
+            already decoded image (left unmodified).
         detections (list): List of detection results from analyze_image.
-        output_path (str): Path to save the annotated image.
+        output_path (str or file-like): Path to save the annotated image, or a
+            writable buffer (e.g. BytesIO) to receive it as JPEG.
     """
     try:
-        print(f"DEBUG: Drawing bounding boxes for {len(detections)} detections")
-        image = Image.open(image_path)
-        draw = ImageDraw.Draw(image)
+        logger.debug("Drawing bounding boxes for %s detections", len(detections))
+        arr = np.array(load_rgb_image(image_path))
+        height, width = arr.shape[:2]
 
-        # Try to load a font, fall back to default if not available
-        try:
-            font = ImageFont.truetype("arial.ttf", 16)
-        except:
-            try:
-                # Try some common font paths
-                font_paths = [
-                    "/System/Library/Fonts/Arial.ttf",  # macOS
-                    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",  # Linux
-                    "C:/Windows/Fonts/arial.ttf",  # Windows
-                ]
-                font = None
-                for font_path in font_paths:
-                    if os.path.exists(font_path):
-                        font = ImageFont.truetype(font_path, 16)
-                        break
-                
-                if font is None:
-                    font = ImageFont.load_default()
-            except:
-                font = None
-
-        colors = ['red', 'blue', 'green', 'yellow', 'purple', 'orange', 'cyan', 'magenta']
-        
         for i, detection in enumerate(detections):
             try:
                 box = detection['box']
                 label = detection['label']
                 score = detection['score']
-                color = colors[i % len(colors)]
+                color = BOX_COLORS[i % len(BOX_COLORS)]
 
                 # Ensure box coordinates are valid integers
                 xmin = max(0, int(box['xmin']))
                 ymin = max(0, int(box['ymin']))
-                xmax = min(image.width, int(box['xmax']))
-                ymax = min(image.height, int(box['ymax']))
+                xmax = min(width, int(box['xmax']))
+                ymax = min(height, int(box['ymax']))
 
                 # Skip invalid boxes
                 if xmin >= xmax or ymin >= ymax:
-                    print(f"DEBUG: Skipping invalid box: {box}")
+                    logger.debug("Skipping invalid box: %s", box)
                     continue
 
                 # Draw rectangle
-                draw.rectangle([(xmin, ymin), (xmax, ymax)], outline=color, width=3)
-                
+                cv2.rectangle(arr, (xmin, ymin), (xmax, ymax), color, 3)
+
                 # Draw label with background
                 text = f"{label} {score:.2f}"
-                
-                if font:
-                    # Calculate text bounding box
-                    bbox = draw.textbbox((xmin, ymin), text, font=font)
-                    # Draw text background
-                    draw.rectangle(bbox, fill=color)
-                    # Draw text
-                    draw.text((xmin, ymin), text, fill="white", font=font)
-                else:
-                    # Fallback without font
-                    draw.text((xmin, ymin), text, fill=color)
-                    
+                (text_w, text_h), baseline = cv2.getTextSize(text, LABEL_FONT, LABEL_FONT_SCALE, LABEL_THICKNESS)
+                text_top = max(0, ymin - text_h - baseline)
+                cv2.rectangle(arr, (xmin, text_top), (xmin + text_w, text_top + text_h + baseline), color, cv2.FILLED)
+                cv2.putText(arr, text, (xmin, text_top + text_h), LABEL_FONT, LABEL_FONT_SCALE,
+                            (255, 255, 255), LABEL_THICKNESS, cv2.LINE_AA)
+
             except Exception as e:
-                print(f"DEBUG: Error drawing detection {detection}: {e}")
+                logger.debug("Error drawing detection %s: %s", detection, e)
                 continue
 
-        image.save(output_path)
-        print(f"Annotated image saved to {output_path}")
+        # Buffers have no file extension to infer the format from
+        image_format = None if isinstance(output_path, (str, os.PathLike)) else "JPEG"
+        Image.fromarray(arr).save(output_path, format=image_format)
+        logger.debug("Annotated image saved to %s", output_path)
         return True
         
     except Exception as e:
-        print(f"Error drawing bounding boxes: {e}")
+        logger.error("Error drawing bounding boxes: %s", e)
         return False
 
 if __name__ == "__main__":
@@ -1,10 +1,27 @@
 import os
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+from postgrest.types import ReturnMethod
+from postgrest.exceptions import APIError
 from dotenv import load_dotenv
-import json
+import logging
+import orjson
 import traceback
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from cachetools import TTLCache
+import httpx
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception_type, retry_if_exception
 
-load_dotenv()
+# Containers inject env directly; only search for a .env file when it's missing
+if "SUPABASE_URL" not in os.environ:
+    load_dotenv()
+
+logger = logging.getLogger(__name__)
 
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_ANON_KEY")
@@ -13,7 +30,163 @@ key: str = os.environ.get("SUPABASE_ANON_KEY")
 if not url or not key:
     raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables")
 
-supabase: Client = create_client(url, key)
+# HTTP pool shared by concurrent scans; HTTP/2 multiplexes requests over one connection
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+HTTP_TIMEOUT = 30.0
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Creates the Supabase client once and reuses it (and its connection pool)."""
+    http_client = httpx.Client(limits=HTTP_POOL_LIMITS, http2=True, timeout=HTTP_TIMEOUT)
+    return create_client(url, key, options=SyncClientOptions(httpx_client=http_client))
+
+@lru_cache(maxsize=1)
+def _scans_table():
+    """
+    Returns the request builder for the 'scans' table, built once.
+
+    The builder only holds the session and path; each query method returns a
+    fresh query object, so it is safe to reuse across calls and threads.
+    """
+    return get_supabase().table("scans")
+
+# --- Retries for transient network failures ---
+# Reads, updates and deletes are idempotent, so any transport error, rate limit
+# or 5xx response is retried. Inserts are only retried when the connection was
+# never established, since a timeout after sending could mean the row was
+# already written.
+TRANSIENT_STATUS_CODES = frozenset({"429", "500", "502", "503", "504"})
+
+def _is_transient_api_error(error):
+    """True for PostgREST errors caused by rate limiting or an unavailable server."""
+    return isinstance(error, APIError) and str(error.code) in TRANSIENT_STATUS_CODES
+
+_retry_idempotent = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(initial=0.2, max=5),
+    retry=retry_if_exception_type(httpx.TransportError) | retry_if_exception(_is_transient_api_error),
+    reraise=True
+)
+_retry_insert = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(initial=0.2, max=5),
+    retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout)),
+    reraise=True
+)
+
+@_retry_idempotent
+def _execute_idempotent(query):
+    return query.execute()
+
+@_retry_insert
+def _execute_insert(query):
+    return query.execute()
+
+# --- Read cache for scan queries (cleared on every write) ---
+# Writes from other processes (the batch CLI, other app instances) only show up
+# once entries expire, so keep the TTL in line with the dashboard's 30 s cache
+SCANS_CACHE_TTL = 30  # Seconds
+_scans_cache = TTLCache(maxsize=512, ttl=SCANS_CACHE_TTL)
+_scans_cache_lock = threading.RLock()
+
+def _copy_scan(scan):
+    """Shallow-copies a cached scan so callers can add fields without touching the cache."""
+    return dict(scan) if scan is not None else None
+
+def invalidate_scans_cache():
+    """Drops all cached reads, e.g. after the scans table changes or on a manual refresh."""
+    with _scans_cache_lock:
+        _scans_cache.clear()
+
+# --- Write-behind queue for bulk scan ingestion ---
+SCAN_BATCH_SIZE = 500        # Max rows per bulk insert
+SCAN_FLUSH_INTERVAL = 1.0    # Max seconds a queued row waits before being flushed
+SCAN_QUEUE_MAXSIZE = 10000   # Producers block once this many rows are pending
+
+_pending_scans = queue.Queue(maxsize=SCAN_QUEUE_MAXSIZE)
+_flusher_lock = threading.Lock()
+_flusher_thread = None
+
+def _loads_report(report):
+    """Parses a structured report given as JSON text (str or bytes)."""
+    return orjson.loads(report if isinstance(report, (bytes, str)) else str(report))
+
+def _format_detection(detection):
+    """Normalizes one detection dict to the stored label/score/box shape."""
+    return {
+        "label": str(detection.get("label", "unknown")),
+        "score": float(detection.get("score", 0.0)),
+        "box": detection.get("box", {})
+    }
+
+def _validate_detections(detections):
+    """
+    Normalizes detections for storage, dropping non-dict entries.
+
+    Args:
+        detections (list): Detections from the CV pipeline.
+
+    Returns:
+        list: The validated detections.
+    """
+    try:
+        return [_format_detection(d) for d in detections if isinstance(d, dict)]
+    except (TypeError, ValueError):
+        pass
+
+    # Slow path: only reached on malformed input, drops just the bad entries
+    validated_detections = []
+    for detection in detections:
+        if not isinstance(detection, dict):
+            continue
+        try:
+            validated_detections.append(_format_detection(detection))
+        except (TypeError, ValueError) as e:
+            logger.debug("Error validating detection %s: %s", detection, e)
+    return validated_detections
+
+def _build_scan_row(latitude, longitude, image_url, annotated_image_url, detection_results, llm_report_text, llm_report_structured):
+    """
+    Validates scan fields and builds the row for the 'scans' table.
+
+    Returns:
+        dict: The row ready for insertion.
+    """
+    # Ensure the structured report is properly formatted
+    if isinstance(llm_report_structured, dict):
+        # Validate the structure
+        if 'summary' not in llm_report_structured:
+            llm_report_structured['summary'] = "No summary provided"
+        if 'issues' not in llm_report_structured:
+            llm_report_structured['issues'] = []
+        
+        # Store as JSON (Supabase will handle this properly)
+        structured_report = llm_report_structured
+    else:
+        # Try to parse if it's a string
+        try:
+            structured_report = _loads_report(llm_report_structured)
+        except:
+            structured_report = {
+                "summary": "Could not parse structured report",
+                "issues": []
+            }
+
+    # Ensure detection_results is properly formatted
+    if not isinstance(detection_results, list):
+        detection_results = []
+    
+    validated_detections = _validate_detections(detection_results)
+    
+    return {
+        "latitude": float(latitude),
+        "longitude": float(longitude),
+        "image_url": str(image_url) if image_url else None,
+        "annotated_image_url": str(annotated_image_url) if annotated_image_url else None,
+        "detection_results": validated_detections,
+        "llm_report": str(llm_report_text) if llm_report_text else None,
+        "llm_report_structured": structured_report
+    }
 
 def store_scan_data(latitude, longitude, image_url, annotated_image_url, detection_results, llm_report_text, llm_report_structured):
     """
@@ -32,95 +205,260 @@ def store_scan_data(latitude, longitude, image_url, annotated_image_url, detecti
         dict: The inserted data if successful, None otherwise.
     """
     try:
-        print("DEBUG: Preparing data for database insertion...")
-        
-        # Ensure the structured report is properly formatted
-        if isinstance(llm_report_structured, dict):
-            # Validate the structure
-            if 'summary' not in llm_report_structured:
-                llm_report_structured['summary'] = "No summary provided"
-            if 'issues' not in llm_report_structured:
-                llm_report_structured['issues'] = []
-            
-            # Store as JSON (Supabase will handle this properly)
-            structured_report = llm_report_structured
-        else:
-            # Try to parse if it's a string
-            try:
-                structured_report = json.loads(str(llm_report_structured))
-            except:
-                structured_report = {
-                    "summary": "Could not parse structured report",
-                    "issues": []
-                }
-
-        # Ensure detection_results is properly formatted
-        if not isinstance(detection_results, list):
-            detection_results = []
+        logger.debug("Preparing data for database insertion...")
         
-        # Validate detection results format
-        validated_detections = []
-        for detection in detection_results:
-            try:
-                if isinstance(detection, dict):
-                    validated_detection = {
-                        "label": str(detection.get("label", "unknown")),
-                        "score": float(detection.get("score", 0.0)),
-                        "box": detection.get("box", {})
-                    }
-                    validated_detections.append(validated_detection)
-            except Exception as e:
-                print(f"DEBUG: Error validating detection {detection}: {e}")
-                continue
-        
-        data_to_insert = {
-            "latitude": float(latitude),
-            "longitude": float(longitude),
-            "image_url": str(image_url) if image_url else None,
-            "annotated_image_url": str(annotated_image_url) if annotated_image_url else None,
-            "detection_results": validated_detections,
-            "llm_report": str(llm_report_text) if llm_report_text else None,
-            "llm_report_structured": structured_report
-        }
+        data_to_insert = _build_scan_row(
+            latitude, longitude, image_url, annotated_image_url,
+            detection_results, llm_report_text, llm_report_structured
+        )
         
-        print(f"DEBUG: Inserting data: {json.dumps(data_to_insert, indent=2)}")
+        logger.debug("Inserting data: %s", data_to_insert)
         
-        response = supabase.table("scans").insert(data_to_insert).execute()
+        response = _execute_insert(_scans_table().insert(data_to_insert))
+        invalidate_scans_cache()
         
         if response.data:
-            print("Data successfully stored in Supabase!")
-            print(f"DEBUG: Inserted record with ID: {response.data[0].get('id', 'unknown')}")
+            logger.info("Data successfully stored in Supabase!")
+            logger.debug("Inserted record with ID: %s", response.data[0].get('id', 'unknown'))
             return response.data[0]
         else:
-            print("WARNING: No data returned from insert operation")
+            logger.warning("No data returned from insert operation")
             return None
             
     except Exception as e:
-        print(f"Error inserting data: {e}")
-        print(f"DEBUG: Full traceback: {traceback.format_exc()}")
+        logger.error("Error inserting data: %s", e)
+        logger.debug("Full traceback: %s", traceback.format_exc())
         return None
 
-def get_all_scans():
+def _insert_scan_rows(rows):
+    """
+    Inserts a batch of scan rows in one request, falling back to row-by-row
+    inserts so one bad row doesn't drop the rest of the batch.
+
+    Rows are only re-inserted individually when the server rejected the batch
+    (an APIError). Any other failure, such as a timeout after the request was
+    sent, may have committed the batch already, so it is reported as failed
+    rather than risking duplicate rows.
+
+    Args:
+        rows (list): Rows built by _build_scan_row.
+
+    Returns:
+        list: One bool per row, True if that row was stored.
     """
-    Retrieves all scans from the database, ordered by creation date (newest first).
+    try:
+        # Queued callers don't need the rows back, so skip returning them
+        _execute_insert(_scans_table().insert(rows, returning=ReturnMethod.minimal))
+        logger.debug("Bulk inserted %s scans", len(rows))
+        return [True] * len(rows)
+    except APIError as e:
+        logger.error("Bulk insert of %s scans failed, retrying row by row: %s", len(rows), e)
+        stored = []
+        for row in rows:
+            try:
+                _execute_insert(_scans_table().insert(row, returning=ReturnMethod.minimal))
+                stored.append(True)
+            except Exception as e:
+                logger.error("Error inserting queued scan: %s", e)
+                stored.append(False)
+        return stored
+    except Exception as e:
+        logger.error("Bulk insert of %s scans failed, not retrying in case it was committed: %s", len(rows), e)
+        return [False] * len(rows)
+    finally:
+        invalidate_scans_cache()
+
+def _flush_pending_scans():
+    """Background loop that drains the queue into bulk inserts."""
+    while True:
+        pending = [_pending_scans.get()]
+        deadline = time.monotonic() + SCAN_FLUSH_INTERVAL
+        while len(pending) < SCAN_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(_pending_scans.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        stored = [False] * len(pending)
+        try:
+            stored = _insert_scan_rows([row for row, _ in pending])
+        except Exception as e:
+            logger.error("Error flushing %s queued scans: %s", len(pending), e)
+        finally:
+            # Resolve the futures before task_done so flush_scans() returns with them settled
+            for (_, future), was_stored in zip(pending, stored):
+                future.set_result(was_stored)
+                _pending_scans.task_done()
+
+def _ensure_flusher():
+    """Starts the background flusher thread on first use."""
+    global _flusher_thread
+    with _flusher_lock:
+        if _flusher_thread is None:
+            _flusher_thread = threading.Thread(target=_flush_pending_scans, name="scan-flusher", daemon=True)
+            _flusher_thread.start()
+
+def queue_scan_data(latitude, longitude, image_url, annotated_image_url, detection_results, llm_report_text, llm_report_structured):
+    """
+    Queues scan data for a batched insert into the Supabase 'scans' table.
+
+    Unlike store_scan_data this returns before the row is written; queued rows
+    are inserted in bulk (up to SCAN_BATCH_SIZE rows, or after
+    SCAN_FLUSH_INTERVAL seconds). Use flush_scans() to wait for them.
+
+    Args:
+        Same as store_scan_data.
+
+    Returns:
+        Future: Resolves to True once the row is stored, or False if its insert
+            failed; None if the row failed validation and was not queued.
+    """
+    try:
+        row = _build_scan_row(
+            latitude, longitude, image_url, annotated_image_url,
+            detection_results, llm_report_text, llm_report_structured
+        )
+    except Exception as e:
+        logger.error("Error preparing scan for queue: %s", e)
+        return None
+
+    _ensure_flusher()
+    stored = Future()
+    _pending_scans.put((row, stored))
+    return stored
+
+def flush_scans():
+    """Blocks until every queued scan has been written (or has failed)."""
+    if _flusher_thread is not None:
+        _pending_scans.join()
+
+atexit.register(flush_scans)
+
+# --- Direct COPY for large backfills ---
+SCAN_COPY_COLUMNS = (
+    "latitude", "longitude", "image_url", "annotated_image_url",
+    "detection_results", "llm_report", "llm_report_structured"
+)
+
+def _copy_scan_rows(rows, db_url):
+    """Streams rows into the scans table over COPY on a direct Postgres connection."""
+    import psycopg
+    from psycopg.types.json import Jsonb
+
+    count = 0
+    copy_sql = f"COPY scans ({', '.join(SCAN_COPY_COLUMNS)}) FROM STDIN"
+    with psycopg.connect(db_url) as conn, conn.cursor() as cur:
+        with cur.copy(copy_sql) as copy:
+            for row in rows:
+                copy.write_row((
+                    row["latitude"], row["longitude"],
+                    row.get("image_url"), row.get("annotated_image_url"),
+                    Jsonb(row.get("detection_results") or []),
+                    row.get("llm_report"),
+                    Jsonb(row.get("llm_report_structured") or {})
+                ))
+                count += 1
+    return count
+
+def bulk_load_scans(rows, use_copy=True):
+    """
+    Loads many scan rows at once, e.g. when backfilling historical scans.
+
+    With use_copy, rows are streamed over Postgres COPY on a direct connection
+    (SUPABASE_DB_URL, ideally the Supavisor session-mode pooler URL), skipping
+    PostgREST and its JSON round trip. Without psycopg or SUPABASE_DB_URL it
+    falls back to bulk REST inserts of SCAN_BATCH_SIZE rows.
+
+    Args:
+        rows (iterable): Rows shaped like the 'scans' table (see _build_scan_row).
+        use_copy (bool): Whether to try COPY before the REST fallback.
+
+    Returns:
+        int: Number of rows stored.
+    """
+    db_url = os.environ.get("SUPABASE_DB_URL")
+    if use_copy and db_url:
+        try:
+            count = _copy_scan_rows(rows, db_url)
+            invalidate_scans_cache()
+            logger.info("Copied %s scans into the database", count)
+            return count
+        except ImportError:
+            logger.warning("psycopg is not installed, falling back to REST inserts")
+
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= SCAN_BATCH_SIZE:
+            count += sum(_insert_scan_rows(batch))
+            batch = []
+    if batch:
+        count += sum(_insert_scan_rows(batch))
+    logger.info("Inserted %s scans into the database", count)
+    return count
+
+def _load_structured_report(scan):
+    """
+    Parses a scan's llm_report_structured in place if it came back as a JSON string.
+
+    Args:
+        scan (dict): A scan record returned by Supabase.
+    """
+    report = scan.get('llm_report_structured')
+    if isinstance(report, str):
+        try:
+            scan['llm_report_structured'] = orjson.loads(report)
+        except orjson.JSONDecodeError:
+            pass  # Left as text; consumers fall back to lenient parsing
+
+# Lightweight columns for list views; skips the large report JSON
+SCAN_LIST_COLUMNS = "id,created_at,latitude,longitude,image_url"
+
+def get_all_scans(limit=None, offset=0, columns="*"):
+    """
+    Retrieves scans from the database, ordered by creation date (newest first).
+
+    Results are cached for SCANS_CACHE_TTL seconds, until the next write from
+    this process, or until invalidate_scans_cache() is called.
+
+    Args:
+        limit (int): Maximum number of scans to return; None returns all of them.
+        offset (int): Number of newest scans to skip (used with limit for paging).
+        columns (str): Columns to select, e.g. SCAN_LIST_COLUMNS for list views.
     
     Returns:
         list: List of scan records, or empty list if error occurs.
     """
+    cache_key = ("all", limit, offset, columns)
+    with _scans_cache_lock:
+        cached = _scans_cache.get(cache_key)
+    if cached is not None:
+        return [_copy_scan(scan) for scan in cached]
+
     try:
-        response = supabase.table('scans').select("*").order('created_at', desc=True).execute()
+        query = _scans_table().select(columns).order('created_at', desc=True)
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        response = _execute_idempotent(query)
         scans = response.data or []
         
-        # Ensure all scans have integer IDs
+        # Ensure all scans have integer IDs and parsed structured reports
         for scan in scans:
             if 'id' in scan:
                 scan['id'] = int(scan['id'])
+            _load_structured_report(scan)
                 
-        print(f"DEBUG: Retrieved {len(scans)} scans from database")
-        return scans
+        logger.debug("Retrieved %s scans from database", len(scans))
+        with _scans_cache_lock:
+            _scans_cache[cache_key] = scans
+        return [_copy_scan(scan) for scan in scans]
         
     except Exception as e:
-        print(f"Error retrieving scans: {e}")
+        logger.error("Error retrieving scans: %s", e)
         return []
 
 def get_scan_by_id(scan_id):
@@ -133,21 +471,69 @@ def get_scan_by_id(scan_id):
     Returns:
         dict: The scan record if found, None otherwise.
     """
+    cache_key = ("id", scan_id)
+    with _scans_cache_lock:
+        cached = _scans_cache.get(cache_key)
+    if cached is not None:
+        return _copy_scan(cached)
+
     try:
-        response = supabase.table('scans').select("*").eq('id', scan_id).execute()
+        response = _execute_idempotent(_scans_table().select("*").eq('id', scan_id))
         
         if response.data and len(response.data) > 0:
             scan = response.data[0]
             scan['id'] = int(scan['id'])
-            return scan
+            _load_structured_report(scan)
+            with _scans_cache_lock:
+                _scans_cache[cache_key] = scan
+            return _copy_scan(scan)
         else:
-            print(f"No scan found with ID: {scan_id}")
+            logger.warning("No scan found with ID: %s", scan_id)
             return None
             
     except Exception as e:
-        print(f"Error retrieving scan {scan_id}: {e}")
+        logger.error("Error retrieving scan %s: %s", scan_id, e)
         return None
 
+def get_scans_by_ids(scan_ids):
+    """
+    Retrieves several scans by ID in a single query.
+
+    Scans already in the read cache are served from it; the rest are fetched
+    together with one in_() filter and cached individually.
+
+    Args:
+        scan_ids (list): IDs of the scans to retrieve.
+
+    Returns:
+        dict: Scan records keyed by integer ID; missing IDs are omitted.
+    """
+    scans = {}
+    missing_ids = []
+    with _scans_cache_lock:
+        for scan_id in dict.fromkeys(int(scan_id) for scan_id in scan_ids):
+            cached = _scans_cache.get(("id", scan_id))
+            if cached is not None:
+                scans[scan_id] = _copy_scan(cached)
+            else:
+                missing_ids.append(scan_id)
+
+    if not missing_ids:
+        return scans
+
+    try:
+        response = _execute_idempotent(_scans_table().select("*").in_('id', missing_ids))
+        for scan in response.data or []:
+            scan['id'] = int(scan['id'])
+            _load_structured_report(scan)
+            with _scans_cache_lock:
+                _scans_cache[("id", scan['id'])] = scan
+            scans[scan['id']] = _copy_scan(scan)
+    except Exception as e:
+        logger.error("Error retrieving scans %s: %s", missing_ids, e)
+
+    return scans
+
 def update_scan_report(scan_id, llm_report_text, llm_report_structured):
     """
     Updates the LLM report for an existing scan.
@@ -166,7 +552,7 @@ def update_scan_report(scan_id, llm_report_text, llm_report_structured):
             structured_report = llm_report_structured
         else:
             try:
-                structured_report = json.loads(str(llm_report_structured))
+                structured_report = _loads_report(llm_report_structured)
             except:
                 structured_report = {
                     "summary": "Could not parse structured report",
@@ -178,17 +564,18 @@ def update_scan_report(scan_id, llm_report_text, llm_report_structured):
             "llm_report_structured": structured_report
         }
         
-        response = supabase.table("scans").update(update_data).eq('id', scan_id).execute()
+        response = _execute_idempotent(_scans_table().update(update_data).eq('id', scan_id))
+        invalidate_scans_cache()
         
         if response.data:
-            print(f"Successfully updated scan {scan_id}")
+            logger.info("Successfully updated scan %s", scan_id)
             return True
         else:
-            print(f"Failed to update scan {scan_id}")
+            logger.error("Failed to update scan %s", scan_id)
             return False
             
     except Exception as e:
-        print(f"Error updating scan {scan_id}: {e}")
+        logger.error("Error updating scan %s: %s", scan_id, e)
         return False
 
 def delete_scan(scan_id):
@@ -202,17 +589,18 @@ def delete_scan(scan_id):
         bool: True if successful, False otherwise.
     """
     try:
-        response = supabase.table("scans").delete().eq('id', scan_id).execute()
+        response = _execute_idempotent(_scans_table().delete().eq('id', scan_id))
+        invalidate_scans_cache()
         
         if response.data:
-            print(f"Successfully deleted scan {scan_id}")
+            logger.info("Successfully deleted scan %s", scan_id)
             return True
         else:
-            print(f"Failed to delete scan {scan_id} (may not exist)")
+            logger.error("Failed to delete scan %s (may not exist)", scan_id)
             return False
             
     except Exception as e:
-        print(f"Error deleting scan {scan_id}: {e}")
+        logger.error("Error deleting scan %s: %s", scan_id, e)
         return False
 
 # Test the database connection
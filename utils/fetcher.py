@@ -1,8 +1,218 @@
 import requests
+from requests.adapters import HTTPAdapter
+import httpx
+import asyncio
 import os
+import logging
+import hashlib
+import pathlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception_type
 from dotenv import load_dotenv
+from PIL import Image
+from io import BytesIO
 
-load_dotenv()  # Load secrets from .env file
+# Load secrets from .env file unless the environment already provides them
+if "STREET_VIEW_API_KEY" not in os.environ:
+    load_dotenv()
+
+STREET_VIEW_API_KEY = os.getenv("STREET_VIEW_API_KEY")
+
+logger = logging.getLogger(__name__)
+
+# Shared session so repeated Street View fetches reuse keep-alive connections
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+
+# On-disk cache of downloaded images so repeated coordinates skip the paid API call
+_CACHE_DIR = pathlib.Path(os.getenv("STREET_VIEW_CACHE_DIR", "~/.cache/urban-scout/streetview")).expanduser()
+
+def _cache_path(latitude, longitude, heading, fov, pitch, size):
+    """Returns the cache file for a Street View request's parameters."""
+    cache_key = f"{latitude}|{longitude}|{heading}|{fov}|{pitch}|{size}"
+    return _CACHE_DIR / (hashlib.sha256(cache_key.encode()).hexdigest()[:16] + ".jpg")
+
+def _store_in_cache(save_path, cached, data=None):
+    """
+    Copies a freshly downloaded image (the file at save_path, or the given
+    bytes) into the cache; failures are non-fatal.
+    """
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary name first so concurrent readers never see a partial file
+        tmp_path = cached.with_suffix(f".{os.getpid()}.tmp")
+        if data is None:
+            shutil.copyfile(save_path, tmp_path)
+        else:
+            tmp_path.write_bytes(data)
+        os.replace(tmp_path, cached)
+    except OSError as e:
+        logger.debug("Could not cache Street View image: %s", e)
+
+STREET_VIEW_URL = "https://maps.googleapis.com/maps/api/streetview"
+
+# Rate limiting and server errors are worth retrying; other 4xx responses are not
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+class _RetryableStatus(Exception):
+    """Raised inside the retry loop for a transient HTTP status."""
+
+    def __init__(self, response):
+        super().__init__(f"Transient HTTP status {response.status_code}")
+        self.response = response
+
+_retry_transient = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(initial=0.2, max=5),
+    retry=retry_if_exception_type((
+        requests.exceptions.Timeout,
+        requests.exceptions.ConnectionError,
+        httpx.TimeoutException,
+        httpx.NetworkError,
+        _RetryableStatus
+    )),
+    reraise=True
+)
+
+@_retry_transient
+def _get_street_view(params):
+    """Opens a streamed Street View response, retrying transient failures."""
+    response = _SESSION.get(STREET_VIEW_URL, params=params, timeout=30, stream=True)
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        response.close()
+        raise _RetryableStatus(response)
+    return response
+
+@_retry_transient
+async def _get_street_view_async(client, params):
+    """Async counterpart of _get_street_view for an httpx.AsyncClient."""
+    response = await client.get(STREET_VIEW_URL, params=params, timeout=30)
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        raise _RetryableStatus(response)
+    return response
+
+def _copy_from_cache(cached, save_path):
+    """Copies a cached image to save_path, returning save_path or None on a miss."""
+    if cached.exists() and cached.stat().st_size > 0:
+        try:
+            shutil.copyfile(cached, save_path)
+            logger.debug("Street View cache hit, copied to %s", save_path)
+            return save_path
+        except OSError as e:
+            logger.debug("Could not read cached Street View image, downloading instead: %s", e)
+    return None
+
+def _street_view_params(latitude, longitude, size, fov, heading, pitch):
+    """Builds the Street View query parameters, or returns None if the API key is missing."""
+    api_key = STREET_VIEW_API_KEY
+    if not api_key:
+        logger.error("STREET_VIEW_API_KEY not found in environment variables")
+        return None
+
+    params = {
+        "size": size,
+        "location": f"{latitude},{longitude}",
+        "fov": fov,
+        "heading": heading,
+        "pitch": pitch,
+        "key": api_key
+    }
+
+    logger.debug("Fetching Street View image for coordinates (%s, %s)", latitude, longitude)
+    logger.debug("Request URL: %s", STREET_VIEW_URL)
+    logger.debug("Parameters: %s", params)
+    return params
+
+STREAM_CHUNK_SIZE = 64 * 1024
+JPEG_QUALITY = 78  # Visually lossless for Street View imagery, noticeably smaller files
+
+def _recompress_jpeg(path):
+    """
+    Re-encodes a downloaded JPEG with optimized, progressive settings in place.
+
+    The original is kept if re-encoding doesn't make it smaller or fails.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        original_size = os.path.getsize(path)
+        with Image.open(path) as image:
+            image.convert("RGB").save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        if os.path.getsize(tmp_path) < original_size:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+    except (OSError, ValueError) as e:
+        logger.debug("Could not recompress %s: %s", path, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _recompress_jpeg_bytes(data):
+    """In-memory counterpart of _recompress_jpeg; returns the smaller encoding."""
+    try:
+        with Image.open(BytesIO(data)) as image:
+            buffer = BytesIO()
+            image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return buffer.getvalue() if buffer.tell() < len(data) else data
+    except (OSError, ValueError) as e:
+        logger.debug("Could not recompress image bytes: %s", e)
+        return data
+
+def _is_image_response(response):
+    """Checks a Street View response's status and content type, logging why it was rejected."""
+    if response.status_code == 200:
+        # Check if we actually got an image (not an error page)
+        content_type = response.headers.get('content-type', '').lower()
+        if 'image' in content_type:
+            return True
+        logger.error("Response is not an image (content-type: %s)", content_type)
+        logger.error("Response content preview: %s", response.text[:200])
+        return False
+
+    logger.error("Unable to download image. Status code: %s", response.status_code)
+    logger.error("Response content: %s", response.text)
+
+    # Handle specific error cases
+    if response.status_code == 403:
+        logger.error("This might be an API key issue. Check if your STREET_VIEW_API_KEY is valid and has Street View API enabled.")
+    elif response.status_code == 400:
+        logger.error("Bad request. Check if the coordinates are valid and the parameters are correct.")
+    return False
+
+def _save_image_response(response, save_path, cached, chunks=None):
+    """
+    Validates a Street View response and writes the image to save_path.
+
+    Works with both requests and httpx responses. The status and content type
+    are checked before the body is read, so a streamed body goes straight to
+    disk without being buffered.
+
+    Args:
+        chunks (iterable): Body chunks to write; defaults to the buffered content.
+
+    Returns:
+        str: The path to the saved image, or None if the response wasn't an image.
+    """
+    logger.debug("Response status code: %s", response.status_code)
+    logger.debug("Response headers: %s", response.headers)
+
+    if not _is_image_response(response):
+        return None
+
+    # Save the image to a file
+    with open(save_path, 'wb') as f:
+        for chunk in (chunks if chunks is not None else (response.content,)):
+            f.write(chunk)
+    
+    # Verify the file was saved and has content
+    if os.path.exists(save_path) and os.path.getsize(save_path) > 0:
+        _recompress_jpeg(save_path)
+        logger.info("Image successfully saved to %s (size: %s bytes)", save_path, os.path.getsize(save_path))
+        _store_in_cache(save_path, cached)
+        return save_path
+    else:
+        logger.error("File was not saved properly to %s", save_path)
+        return None
 
 def fetch_street_view_image(latitude, longitude, save_path="street_view.jpg", size="600x400", fov="90", heading="0", pitch="0"):
     """
@@ -20,74 +230,89 @@ def fetch_street_view_image(latitude, longitude, save_path="street_view.jpg", si
     Returns:
         str: The path to the saved image, or None if the request failed.
     """
-    base_url = "https://maps.googleapis.com/maps/api/streetview"
-    
-    api_key = os.getenv("STREET_VIEW_API_KEY")
-    if not api_key:
-        print("Error: STREET_VIEW_API_KEY not found in environment variables")
+    cached = _cache_path(latitude, longitude, heading, fov, pitch, size)
+    if _copy_from_cache(cached, save_path):
+        return save_path
+
+    params = _street_view_params(latitude, longitude, size, fov, heading, pitch)
+    if params is None:
         return None
 
-    params = {
-        "size": size,
-        "location": f"{latitude},{longitude}",
-        "fov": fov,
-        "heading": heading,
-        "pitch": pitch,
-        "key": api_key
-    }
+    try:
+        with _get_street_view(params) as response:
+            return _save_image_response(
+                response, save_path, cached,
+                chunks=response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            )
 
-    print(f"DEBUG: Fetching Street View image for coordinates ({latitude}, {longitude})")
-    print(f"DEBUG: Request URL: {base_url}")
-    print(f"DEBUG: Parameters: {params}")
+    except _RetryableStatus as e:
+        logger.error("Unable to download image. Status code: %s (after retries)", e.response.status_code)
+        return None
+    except requests.exceptions.Timeout:
+        logger.error("Request timed out after 30 seconds")
+        return None
+    except requests.exceptions.ConnectionError:
+        logger.error("Connection error. Check your internet connection.")
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error("Request failed with exception: %s", e)
+        return None
+    except Exception as e:
+        logger.error("Unexpected error occurred: %s", e)
+        return None
+
+def fetch_street_view_bytes(latitude, longitude, size="600x400", fov="90", heading="0", pitch="0"):
+    """
+    Fetches a Street View image as JPEG bytes, without writing a working file.
+
+    Args:
+        Same as fetch_street_view_image, minus save_path.
 
+    Returns:
+        bytes: The JPEG data, or None if the request failed.
+    """
+    cached = _cache_path(latitude, longitude, heading, fov, pitch, size)
     try:
-        response = requests.get(base_url, params=params, timeout=30)
-        
-        print(f"DEBUG: Response status code: {response.status_code}")
-        print(f"DEBUG: Response headers: {dict(response.headers)}")
-
-        if response.status_code == 200:
-            # Check if we actually got an image (not an error page)
-            content_type = response.headers.get('content-type', '').lower()
-            if 'image' in content_type:
-                # Save the image to a file
-                with open(save_path, 'wb') as f:
-                    f.write(response.content)
-                
-                # Verify the file was saved and has content
-                if os.path.exists(save_path) and os.path.getsize(save_path) > 0:
-                    print(f"Image successfully saved to {save_path} (size: {os.path.getsize(save_path)} bytes)")
-                    return save_path
-                else:
-                    print(f"Error: File was not saved properly to {save_path}")
-                    return None
-            else:
-                print(f"Error: Response is not an image (content-type: {content_type})")
-                print(f"Response content preview: {response.text[:200]}")
+        data = cached.read_bytes()
+        if data:
+            logger.debug("Street View cache hit for (%s, %s)", latitude, longitude)
+            return data
+    except OSError:
+        pass  # Not cached yet
+
+    params = _street_view_params(latitude, longitude, size, fov, heading, pitch)
+    if params is None:
+        return None
+
+    try:
+        with _get_street_view(params) as response:
+            if not _is_image_response(response):
                 return None
-        else:
-            print(f"Error: Unable to download image. Status code: {response.status_code}")
-            print(f"Response content: {response.text}")
-            
-            # Handle specific error cases
-            if response.status_code == 403:
-                print("This might be an API key issue. Check if your STREET_VIEW_API_KEY is valid and has Street View API enabled.")
-            elif response.status_code == 400:
-                print("Bad request. Check if the coordinates are valid and the parameters are correct.")
-                
+            data = response.content
+
+        if not data:
+            logger.error("Street View returned an empty image")
             return None
-            
+
+        data = _recompress_jpeg_bytes(data)
+        logger.info("Image successfully fetched (size: %s bytes)", len(data))
+        _store_in_cache(None, cached, data=data)
+        return data
+
+    except _RetryableStatus as e:
+        logger.error("Unable to download image. Status code: %s (after retries)", e.response.status_code)
+        return None
     except requests.exceptions.Timeout:
-        print("Error: Request timed out after 30 seconds")
+        logger.error("Request timed out after 30 seconds")
         return None
     except requests.exceptions.ConnectionError:
-        print("Error: Connection error. Check your internet connection.")
+        logger.error("Connection error. Check your internet connection.")
         return None
     except requests.exceptions.RequestException as e:
-        print(f"Error: Request failed with exception: {e}")
+        logger.error("Request failed with exception: %s", e)
         return None
     except Exception as e:
-        print(f"Error: Unexpected error occurred: {e}")
+        logger.error("Unexpected error occurred: %s", e)
         return None
 
 def fetch_multiple_angles(latitude, longitude, base_save_path="street_view", angles=[0, 90, 180, 270]):
@@ -103,21 +328,97 @@ def fetch_multiple_angles(latitude, longitude, base_save_path="street_view", ang
     Returns:
         list: List of paths to saved images, or empty list if all failed.
     """
-    saved_images = []
-    
-    for angle in angles:
-        save_path = f"{base_save_path}_{angle}.jpg"
-        result = fetch_street_view_image(
+    if not angles:
+        return []
+
+    def fetch_angle(angle):
+        return fetch_street_view_image(
             latitude=latitude,
             longitude=longitude,
-            save_path=save_path,
+            save_path=f"{base_save_path}_{angle}.jpg",
             heading=str(angle)
         )
-        
+
+    # Each angle is an independent request, so fetch them all at once
+    with ThreadPoolExecutor(max_workers=min(8, len(angles))) as executor:
+        results = list(executor.map(fetch_angle, angles))
+
+    saved_images = []
+    for angle, result in zip(angles, results):
+        if result:
+            saved_images.append(result)
+        else:
+            logger.error("Failed to fetch image at angle %s", angle)
+    
+    return saved_images
+
+async def fetch_street_view_image_async(latitude, longitude, save_path="street_view.jpg", size="600x400", fov="90", heading="0", pitch="0", client=None):
+    """
+    Async variant of fetch_street_view_image.
+
+    Args:
+        Same as fetch_street_view_image, plus:
+        client (httpx.AsyncClient): Optional shared client; pass one when
+            fetching many images so they reuse its connection pool.
+
+    Returns:
+        str: The path to the saved image, or None if the request failed.
+    """
+    cached = _cache_path(latitude, longitude, heading, fov, pitch, size)
+    if _copy_from_cache(cached, save_path):
+        return save_path
+
+    params = _street_view_params(latitude, longitude, size, fov, heading, pitch)
+    if params is None:
+        return None
+
+    try:
+        if client is None:
+            async with httpx.AsyncClient(timeout=30) as own_client:
+                response = await _get_street_view_async(own_client, params)
+        else:
+            response = await _get_street_view_async(client, params)
+        return _save_image_response(response, save_path, cached)
+
+    except _RetryableStatus as e:
+        # Still failing after retries; report it like any other bad status
+        return _save_image_response(e.response, save_path, cached)
+
+    except httpx.TimeoutException:
+        logger.error("Request timed out after 30 seconds")
+        return None
+    except httpx.HTTPError as e:
+        logger.error("Request failed with exception: %s", e)
+        return None
+    except Exception as e:
+        logger.error("Unexpected error occurred: %s", e)
+        return None
+
+async def fetch_multiple_angles_async(latitude, longitude, base_save_path="street_view", angles=[0, 90, 180, 270]):
+    """
+    Async variant of fetch_multiple_angles; all angles share one AsyncClient.
+
+    Returns:
+        list: List of paths to saved images, or empty list if all failed.
+    """
+    async with httpx.AsyncClient(timeout=30) as client:
+        results = await asyncio.gather(*(
+            fetch_street_view_image_async(
+                latitude=latitude,
+                longitude=longitude,
+                save_path=f"{base_save_path}_{angle}.jpg",
+                heading=str(angle),
+                client=client
+            )
+            for angle in angles
+        ))
+
+    saved_images = []
+    for angle, result in zip(angles, results):
         if result:
             saved_images.append(result)
         else:
-            print(f"Failed to fetch image at angle {angle}")
+            logger.error("Failed to fetch image at angle %s", angle)
     
     return saved_images
 
@@ -137,16 +438,16 @@ def validate_coordinates(latitude, longitude):
         lon = float(longitude)
         
         if not (-90 <= lat <= 90):
-            print(f"Invalid latitude: {lat}. Must be between -90 and 90.")
+            logger.warning("Invalid latitude: %s. Must be between -90 and 90.", lat)
             return False
             
         if not (-180 <= lon <= 180):
-            print(f"Invalid longitude: {lon}. Must be between -180 and 180.")
+            logger.warning("Invalid longitude: %s. Must be between -180 and 180.", lon)
             return False
             
         return True
     except (ValueError, TypeError):
-        print(f"Invalid coordinate format: latitude={latitude}, longitude={longitude}")
+        logger.warning("Invalid coordinate format: latitude=%s, longitude=%s", latitude, longitude)
         return False
 
 # Test the function
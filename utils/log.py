@@ -0,0 +1,57 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Loggers for the project's own modules (and any of them run as a script);
+# third-party loggers are left alone.
+APP_LOGGERS = ("utils", "chains", "__main__")
+
+_listener = None
+_log_queue = None
+
+def _build_formatter():
+    """Plain messages by default, JSON lines when LOG_FORMAT=json."""
+    if os.getenv("LOG_FORMAT", "").lower() == "json":
+        from pythonjsonlogger.json import JsonFormatter
+        return JsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    return logging.Formatter("%(message)s")
+
+def setup_logging(level=None):
+    """
+    Route project log records through a queue drained by a background thread,
+    so scan workers and the batch flusher never block on stdout.
+
+    Safe to call more than once; only the first call installs the handler,
+    later calls with an explicit level just change the level.
+    """
+    global _listener, _log_queue
+    if _listener is not None:
+        if level:
+            for name in APP_LOGGERS:
+                logging.getLogger(name).setLevel(level)
+        return
+
+    level = level or os.getenv("LOG_LEVEL", "INFO").upper()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(_build_formatter())
+
+    _log_queue = queue.Queue(-1)
+    _listener = QueueListener(_log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    queue_handler = QueueHandler(_log_queue)
+    for name in APP_LOGGERS:
+        app_logger = logging.getLogger(name)
+        app_logger.addHandler(queue_handler)
+        app_logger.setLevel(level)
+        app_logger.propagate = False
+
+def flush_logs():
+    """Blocks until queued records are written, e.g. before printing a final summary."""
+    if _log_queue is not None:
+        _log_queue.join()
@@ -6,119 +6,314 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
 
-from utils.fetcher import fetch_street_view_image, validate_coordinates
-from utils.cv_analysis import analyze_image_combined, draw_bounding_boxes
-from utils.database import store_scan_data
-from utils.storage import upload_image_to_supabase
-from chains.analyst_chain import generate_report
+from utils.log import setup_logging, flush_logs
+from utils.fetcher import fetch_street_view_bytes, validate_coordinates
 import json
+import logging
 import traceback
+import threading
+import asyncio
+import random
+import time
+from io import BytesIO
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from cachetools import TTLCache
 
-def main(lat, lon):
+# utils.cv_analysis (torch/transformers), utils.storage and utils.database
+# (Supabase) and chains.analyst_chain (LangChain) take seconds to import, so
+# they are imported inside the functions that use them. Invalid coordinates
+# and --help then return without loading any of them.
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# In-flight scans keyed by rounded coordinates, so concurrent requests for the
+# same spot share one pipeline run instead of repeating it
+_inflight_scans = {}
+_inflight_lock = threading.Lock()
+COALESCE_PRECISION = 5  # ~1 m at the equator
+
+# Grid cells scanned successfully in the last hour; a repeat request for the
+# same cell returns straight away instead of re-running the pipeline
+SCAN_CACHE_PRECISION = 4  # ~11 m at the equator
+SCAN_CACHE_TTL = 3600     # Seconds before a cell can be rescanned
+_recent_scans = TTLCache(maxsize=1024, ttl=SCAN_CACHE_TTL)
+_recent_scans_lock = threading.Lock()
+# Returned by main() instead of True when a recent scan of the cell made it skip
+RECENTLY_SCANNED = "recently_scanned"
+
+# The annotated image carries the same pixels as the original plus the boxes,
+# so by default only it is uploaded and image_url is stored empty.
+# KEEP_ORIGINAL=1 uploads the unannotated frame too.
+KEEP_ORIGINAL = os.environ.get("KEEP_ORIGINAL") == "1"
+
+def _claim_scan(key):
+    """Returns (future, is_owner) for a scan key, registering a new future if none is running."""
+    with _inflight_lock:
+        future = _inflight_scans.get(key)
+        if future is not None:
+            return future, False
+        future = Future()
+        _inflight_scans[key] = future
+        return future, True
+
+def _release_scan(key):
+    with _inflight_lock:
+        _inflight_scans.pop(key, None)
+
+def _remember_scan(lat, lon):
+    """Marks the location's grid cell as scanned so repeat requests can skip it."""
+    with _recent_scans_lock:
+        _recent_scans[_coalesce_key(lat, lon, SCAN_CACHE_PRECISION)] = True
+
+def _coalesce_key(lat, lon, precision=COALESCE_PRECISION):
+    """Rounded coordinates identifying a scan, or None if they aren't numbers."""
+    try:
+        return (round(float(lat), precision), round(float(lon), precision))
+    except (TypeError, ValueError):
+        return None
+
+def main(lat, lon, progress_callback=None, force=False):
     """
     Main scanning function that orchestrates the entire process.
+
+    A scan requested while an identical one (same coordinates rounded to
+    COALESCE_PRECISION decimals) is running waits for and returns that result.
+    A location whose grid cell (SCAN_CACHE_PRECISION decimals) was scanned
+    successfully within SCAN_CACHE_TTL seconds is not scanned again unless
+    force is set; RECENTLY_SCANNED is returned instead, so callers can tell
+    that no new scan was stored.
     
     Args:
         lat (float): Latitude of the location to scan
         lon (float): Longitude of the location to scan
+        progress_callback (callable): Optional callback(percent, message) invoked
+            as each pipeline step starts
+        force (bool): Rescan even if the grid cell was scanned recently
         
     Returns:
-        bool: True if scan completed successfully, False otherwise
+        bool or str: True if scan completed successfully, RECENTLY_SCANNED if
+            it was skipped (truthy), False otherwise
+    """
+    return asyncio.run(main_async(lat, lon, progress_callback, force))
+
+async def main_async(lat, lon, progress_callback=None, force=False, background_store=False):
+    """
+    Async version of main(); blocking steps run in worker threads so
+    independent steps overlap.
+
+    Args:
+        Same as main, plus:
+        background_store (bool): Queue the database insert (see
+            database.queue_scan_data) and return without waiting for it.
+            Call flush_scans() before relying on the row being stored; the
+            grid cell is only cached once the insert succeeds.
+
+    Returns:
+        bool or str: Same as main
+    """
+    key = _coalesce_key(lat, lon)
+    if key is None:
+        return await _run_scan_async(lat, lon, progress_callback, background_store)  # Rejected by validation
+
+    cell = _coalesce_key(lat, lon, SCAN_CACHE_PRECISION)
+    if not force:
+        with _recent_scans_lock:
+            recently_scanned = cell in _recent_scans
+        if recently_scanned:
+            logger.info("♻️ Location %s, %s was scanned in the last %s minutes, skipping", lat, lon, SCAN_CACHE_TTL // 60)
+            return RECENTLY_SCANNED
+
+    future, is_owner = _claim_scan(key)
+    if not is_owner:
+        logger.info("⏳ Scan for %s, %s already in progress, waiting for its result...", lat, lon)
+        return await asyncio.wrap_future(future)
+
+    try:
+        result = await _run_scan_async(lat, lon, progress_callback, background_store)
+        if result and not background_store:
+            _remember_scan(lat, lon)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _release_scan(key)
+
+async def _none():
+    return None
+
+_warm = False
+_warm_lock = threading.Lock()
+
+def warmup():
+    """
+    Loads the detection models and the report chain once, up front.
+
+    Concurrent first scans would otherwise each start loading the same models;
+    calling this before a batch makes every scan start warm. Safe to call
+    repeatedly.
+    """
+    global _warm
+    with _warm_lock:
+        if _warm:
+            return
+        logger.info("🔥 Warming up detection models...")
+        try:
+            from utils.cv_analysis import load_models
+            from chains.analyst_chain import prepare_report_cache
+            load_models()
+            prepare_report_cache()
+        except Exception as e:
+            # The real scans will report the failure; don't block them here
+            logger.warning("⚠️ Warmup failed: %s", e)
+        _warm = True
+
+def _detect_objects(image_data):
+    """Decodes the image once and runs detection; returns (image, detections)."""
+    from utils.cv_analysis import analyze_image_combined, load_rgb_image
+    image = load_rgb_image(image_data)
+    return image, analyze_image_combined(image, confidence_threshold=0.3)
+
+def _checked_report(llm_report):
+    """Logs a generated report, substituting a fallback if generation failed."""
+    if llm_report and isinstance(llm_report, dict):
+        logger.info("✅ AI analysis report generated successfully")
+        
+        # Print summary for debugging
+        summary = llm_report.get('summary', 'No summary available')
+        issues = llm_report.get('issues', [])
+        logger.info("Summary: %s", summary)
+        logger.info("Issues found: %s", len(issues))
+        
+        for i, issue in enumerate(issues):
+            issue_type = issue.get('type', 'Unknown')
+            severity = issue.get('severity', 'Unknown')
+            description = issue.get('description', 'No description')
+            logger.debug("  %s. %s (%s): %s", i+1, issue_type, severity, description)
+        return llm_report
+
+    logger.warning("⚠️ AI analysis failed, using fallback report")
+    return {
+        "summary": "AI analysis encountered an error, but object detection was successful.",
+        "issues": []
+    }
+
+async def _run_scan_async(lat, lon, progress_callback=None, background_store=False):
+    """
+    Runs the full scan pipeline for one location; see main().
+
+    Pipeline order:
+        fetch -> (upload original || CV analysis) -> annotate
+              -> (upload annotated || LLM report) -> store
+
+    The original is only uploaded with KEEP_ORIGINAL set, or when there is no
+    annotated image to upload in its place; otherwise image_url is stored as
+    None.
+
+    Images stay in memory as JPEG bytes throughout, so there are no working
+    files to write, re-read or clean up.
     """
-    print(f"🚀 Starting scan for location: {lat}, {lon}")
+    logger.info("🚀 Starting scan for location: %s, %s", lat, lon)
+    
+    def report_progress(percent, message):
+        if progress_callback:
+            progress_callback(percent, message)
     
     try:
         # Validate coordinates first
         if not validate_coordinates(lat, lon):
-            print("❌ Invalid coordinates provided")
+            logger.error("❌ Invalid coordinates provided")
             return False
+
+        from utils.cv_analysis import draw_bounding_boxes
+        from utils.database import store_scan_data, queue_scan_data
+        from utils.storage import upload_image_async
+        from chains.analyst_chain import generate_report
         
         # 1. Fetch Street View Image
-        print("📷 Step 1: Fetching street view image...")
-        image_path = fetch_street_view_image(lat, lon, "latest_scan.jpg")
-        if not image_path:
-            print("❌ Failed to fetch street view image")
+        report_progress(10, "📷 Fetching street view image...")
+        logger.info("📷 Step 1: Fetching street view image...")
+        image_data = await asyncio.to_thread(fetch_street_view_bytes, lat, lon)
+        if not image_data:
+            logger.error("❌ Failed to fetch street view image")
             return False
-        print("✅ Street view image fetched successfully")
+        logger.info("✅ Street view image fetched successfully")
         
-        # 2. Upload original image to Supabase Storage and get URL
-        print("☁️ Step 2: Uploading original image to cloud storage...")
-        public_image_url = upload_image_to_supabase(image_path)
-        if not public_image_url:
-            print("❌ Failed to upload original image to storage")
-            return False
-        print(f"✅ Original image uploaded: {public_image_url}")
+        # 2. Start uploading the original image; it runs alongside steps 3-6
+        upload_original_task = None
+        if KEEP_ORIGINAL:
+            report_progress(25, "☁️ Uploading original image to cloud storage...")
+            logger.info("☁️ Step 2: Uploading original image to cloud storage...")
+            upload_original_task = asyncio.create_task(upload_image_async(image_data))
         
         # 3. Analyze Image with Computer Vision
-        print("🔍 Step 3: Analyzing image with computer vision...")
-        detections = analyze_image_combined(image_path, confidence_threshold=0.3)
-        print(f"✅ Computer vision analysis complete. Found {len(detections)} objects")
+        report_progress(40, "🔍 Analyzing with computer vision...")
+        logger.info("🔍 Step 3: Analyzing image with computer vision...")
+        image, detections = await asyncio.to_thread(_detect_objects, image_data)
+        logger.info("✅ Computer vision analysis complete. Found %s objects", len(detections))
         
         # Print detected objects for debugging
         if detections:
-            print("Detected objects:")
+            logger.debug("Detected objects:")
             for i, det in enumerate(detections):
-                print(f"  {i+1}. {det['label']} (confidence: {det['score']:.2f})")
+                logger.debug("  %s. %s (confidence: %.2f)", i+1, det['label'], det['score'])
         else:
-            print("  No objects detected")
+            logger.debug("  No objects detected")
         
         # 4. Create annotated image
-        print("🎨 Step 4: Creating annotated image...")
-        annotated_image_path = "latest_scan_annotated.jpg"
-        annotation_success = draw_bounding_boxes(image_path, detections, annotated_image_path)
+        report_progress(55, "🎨 Creating annotated image...")
+        logger.info("🎨 Step 4: Creating annotated image...")
+        annotated_buffer = BytesIO()
+        annotation_success = await asyncio.to_thread(draw_bounding_boxes, image, detections, annotated_buffer)
         
         if annotation_success:
-            print("✅ Annotated image created successfully")
+            logger.info("✅ Annotated image created successfully")
         else:
-            print("⚠️ Warning: Failed to create annotated image, using original")
-            annotated_image_path = image_path
+            logger.warning("⚠️ Failed to create annotated image, using original")
         
-        # 5. Upload annotated image
-        print("☁️ Step 5: Uploading annotated image to cloud storage...")
-        if annotation_success:
-            public_annotated_image_url = upload_image_to_supabase(annotated_image_path)
-        else:
-            public_annotated_image_url = public_image_url  # Use original if annotation failed
+        # 5 + 6. Finish both uploads while the LLM writes the report
+        report_progress(65, "🤖 Uploading images and generating AI report...")
+        logger.info("☁️ Step 5: Uploading annotated image to cloud storage...")
+        logger.info("🤖 Step 6: Generating AI analysis report...")
+        if upload_original_task is None and not annotation_success:
+            upload_original_task = asyncio.create_task(upload_image_async(image_data))
+        public_image_url, public_annotated_image_url, llm_report = await asyncio.gather(
+            upload_original_task if upload_original_task else _none(),
+            upload_image_async(annotated_buffer.getvalue()) if annotation_success else _none(),
+            asyncio.to_thread(generate_report, detections)
+        )
         
-        if public_annotated_image_url:
-            print(f"✅ Annotated image uploaded: {public_annotated_image_url}")
-        else:
-            print("⚠️ Warning: Failed to upload annotated image")
-            public_annotated_image_url = public_image_url
+        if annotation_success and not public_annotated_image_url:
+            logger.warning("⚠️ Failed to upload annotated image")
+            if not public_image_url and not KEEP_ORIGINAL:
+                # The original was skipped in favour of the annotated image; store it instead
+                public_image_url = await upload_image_async(image_data)
+        elif public_annotated_image_url:
+            logger.info("✅ Annotated image uploaded: %s", public_annotated_image_url)
         
-        # 6. Generate AI Analysis Report
-        print("🤖 Step 6: Generating AI analysis report...")
-        llm_report = generate_report(detections)
+        if not public_image_url and not public_annotated_image_url:
+            logger.error("❌ Failed to upload image to storage")
+            return False
+        if public_image_url:
+            logger.info("✅ Original image uploaded: %s", public_image_url)
         
-        if llm_report and isinstance(llm_report, dict):
-            print("✅ AI analysis report generated successfully")
-            
-            # Print summary for debugging
-            summary = llm_report.get('summary', 'No summary available')
-            issues = llm_report.get('issues', [])
-            print(f"Summary: {summary}")
-            print(f"Issues found: {len(issues)}")
-            
-            for i, issue in enumerate(issues):
-                issue_type = issue.get('type', 'Unknown')
-                severity = issue.get('severity', 'Unknown')
-                description = issue.get('description', 'No description')
-                print(f"  {i+1}. {issue_type} ({severity}): {description}")
-        else:
-            print("⚠️ Warning: AI analysis failed, using fallback report")
-            llm_report = {
-                "summary": "AI analysis encountered an error, but object detection was successful.",
-                "issues": []
-            }
+        # Use the original if there is no annotated image
+        public_annotated_image_url = public_annotated_image_url or public_image_url
+        
+        llm_report = _checked_report(llm_report)
         
         # 7. Prepare data for database storage
-        print("💾 Step 7: Preparing data for database storage...")
+        logger.info("💾 Step 7: Preparing data for database storage...")
         llm_report_text = json.dumps(llm_report, indent=2)
         
         # 8. Store everything in Database
-        print("💾 Step 8: Storing scan data in database...")
+        report_progress(90, "💾 Storing scan data in database...")
+        logger.info("💾 Step 8: Storing scan data in database...")
         
-        database_result = store_scan_data(
+        scan_row = dict(
             latitude=lat,
             longitude=lon,
             image_url=public_image_url,
@@ -128,49 +323,50 @@ def main(lat, lon):
             llm_report_structured=llm_report
         )
         
+        if background_store:
+            # The write-behind flusher inserts it in bulk; nothing to wait for here
+            stored = queue_scan_data(**scan_row)
+            if stored is None:
+                logger.error("❌ Failed to queue scan data for the database")
+                return False
+            # Only skip rescans of this cell once the row has actually been written
+            def remember_if_stored(future):
+                if future.result():
+                    _remember_scan(lat, lon)
+            stored.add_done_callback(remember_if_stored)
+            logger.info("✅ Scan data queued for the database")
+            logger.info("🎉 Scan completed successfully!")
+            return True
+        
+        database_result = await asyncio.to_thread(store_scan_data, **scan_row)
+        
         if database_result:
             scan_id = database_result.get('id', 'unknown')
-            print(f"✅ Scan data stored successfully with ID: {scan_id}")
+            logger.info("✅ Scan data stored successfully with ID: %s", scan_id)
         else:
-            print("❌ Failed to store scan data in database")
+            logger.error("❌ Failed to store scan data in database")
             return False
         
-        # 9. Cleanup temporary files
-        print("🧹 Step 9: Cleaning up temporary files...")
-        try:
-            if os.path.exists(image_path):
-                os.remove(image_path)
-                print(f"Removed {image_path}")
-            
-            if annotation_success and os.path.exists(annotated_image_path):
-                os.remove(annotated_image_path)
-                print(f"Removed {annotated_image_path}")
-                
-        except Exception as cleanup_error:
-            print(f"⚠️ Warning: Cleanup failed: {cleanup_error}")
-        
-        print("🎉 Scan completed successfully!")
+        logger.info("🎉 Scan completed successfully!")
         return True
         
     except Exception as e:
-        print(f"❌ Critical error during scan: {e}")
-        print(f"DEBUG: Full traceback: {traceback.format_exc()}")
-        
-        # Cleanup on error
-        try:
-            temp_files = ["latest_scan.jpg", "latest_scan_annotated.jpg"]
-            for temp_file in temp_files:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                    print(f"Cleaned up {temp_file}")
-        except:
-            pass
-            
+        logger.error("❌ Critical error during scan: %s", e)
+        logger.debug("Full traceback: %s", traceback.format_exc())
         return False
 
+RETRY_MAX_DELAY = 30  # Seconds
+
+def _retry_delay(attempt):
+    """Exponential backoff with jitter, so concurrent workers don't retry in lockstep."""
+    return min(RETRY_MAX_DELAY, (2 ** attempt) + random.uniform(0, 1))
+
 def scan_with_retry(lat, lon, max_retries=2):
     """
     Attempts to scan a location with retry logic.
+
+    Invalid coordinates fail immediately; other failures are retried with
+    exponential backoff.
     
     Args:
         lat (float): Latitude of the location to scan
@@ -180,52 +376,281 @@ def scan_with_retry(lat, lon, max_retries=2):
     Returns:
         bool: True if scan completed successfully, False otherwise
     """
+    # Retrying can't fix bad input
+    if not validate_coordinates(lat, lon):
+        logger.error("❌ Invalid coordinates provided")
+        return False
+
     for attempt in range(max_retries + 1):
         if attempt > 0:
-            print(f"🔄 Retry attempt {attempt}/{max_retries}")
+            logger.info("🔄 Retry attempt %s/%s", attempt, max_retries)
         
         success = main(lat, lon)
         if success:
             return True
         
         if attempt < max_retries:
-            print("⏱️ Waiting before retry...")
-            import time
-            time.sleep(2)  # Wait 2 seconds before retry
+            delay = _retry_delay(attempt)
+            logger.info("⏱️ Waiting %.1fs before retry...", delay)
+            time.sleep(delay)
     
-    print(f"❌ All {max_retries + 1} attempts failed")
+    logger.error("❌ All %s attempts failed", max_retries + 1)
+    return False
+
+async def scan_with_retry_async(lat, lon, max_retries=2):
+    """
+    Async version of scan_with_retry().
+
+    Args:
+        Same as scan_with_retry.
+
+    Returns:
+        bool: True if scan completed successfully, False otherwise
+    """
+    if not validate_coordinates(lat, lon):
+        logger.error("❌ Invalid coordinates provided")
+        return False
+
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            logger.info("🔄 Retry attempt %s/%s", attempt, max_retries)
+
+        if await main_async(lat, lon):
+            return True
+
+        if attempt < max_retries:
+            delay = _retry_delay(attempt)
+            logger.info("⏱️ Waiting %.1fs before retry...", delay)
+            await asyncio.sleep(delay)
+
+    logger.error("❌ All %s attempts failed", max_retries + 1)
     return False
 
-def scan_multiple_locations(locations):
+DEFAULT_BATCH_CONCURRENCY = 8
+
+def scan_multiple_locations(locations, concurrency=DEFAULT_BATCH_CONCURRENCY):
     """
-    Scans multiple locations in batch.
+    Scans multiple locations in batch, with up to `concurrency` fetches and
+    uploads in flight at once.
     
     Args:
         locations (list): List of tuples (lat, lon, name)
+        concurrency (int): Workers for each network-bound stage
         
     Returns:
         dict: Results summary
     """
+    return asyncio.run(scan_multiple_locations_async(locations, concurrency))
+
+# Workers per stage of the batch pipeline. CV shares one model (and usually
+# one GPU), so only a couple of analyses run at once; network stages scale
+# with the batch concurrency.
+CV_STAGE_WORKERS = 2
+CV_BATCH_SIZE = 8  # Max images per batched DETR forward pass
+STORE_STAGE_WORKERS = 1
+
+@dataclass
+class ScanContext:
+    """One location's state as it moves through the batch pipeline stages."""
+    index: int
+    lat: float
+    lon: float
+    name: str
+    image_data: bytes = None
+    detections: list = field(default_factory=list)
+    annotated_data: bytes = None
+    image_url: str = None
+    annotated_image_url: str = None
+    llm_report: dict = None
+    stored: Future = None  # Resolves once the queued row is inserted (see queue_scan_data)
+    success: bool = False
+
+async def _fetch_stage(ctx):
+    """Validates and fetches; returns False to drop the scan from the pipeline."""
+    logger.info("--- Scanning location %s: %s ---", ctx.index + 1, ctx.name)
+    if not validate_coordinates(ctx.lat, ctx.lon):
+        logger.error("❌ Invalid coordinates for %s", ctx.name)
+        return False
+
+    cell = _coalesce_key(ctx.lat, ctx.lon, SCAN_CACHE_PRECISION)
+    with _recent_scans_lock:
+        if cell in _recent_scans:
+            logger.info("♻️ %s was scanned in the last %s minutes, skipping", ctx.name, SCAN_CACHE_TTL // 60)
+            ctx.success = True
+            return False
+
+    ctx.image_data = await asyncio.to_thread(fetch_street_view_bytes, ctx.lat, ctx.lon)
+    if not ctx.image_data:
+        logger.error("❌ Failed to fetch street view image for %s", ctx.name)
+        return False
+    return True
+
+def _analyze_and_annotate(batch):
+    """Runs batched detection and draws each annotated JPEG (blocking)."""
+    from utils.cv_analysis import analyze_images_combined_batch, draw_bounding_boxes, load_rgb_image
+    images = [load_rgb_image(ctx.image_data) for ctx in batch]
+    all_detections = analyze_images_combined_batch(images, confidence_threshold=0.3)
+    for ctx, image, detections in zip(batch, images, all_detections):
+        ctx.detections = detections
+        logger.info("✅ %s: found %s objects", ctx.name, len(detections))
+        annotated_buffer = BytesIO()
+        if draw_bounding_boxes(image, detections, annotated_buffer):
+            ctx.annotated_data = annotated_buffer.getvalue()
+        else:
+            logger.warning("⚠️ Failed to create annotated image for %s, using original", ctx.name)
+
+async def _analyze_stage(batch):
+    await asyncio.to_thread(_analyze_and_annotate, batch)
+    return batch
+
+async def _publish_stage(ctx):
+    """Uploads the images (see KEEP_ORIGINAL) while the report is generated."""
+    from utils.storage import upload_image_async
+    from chains.analyst_chain import generate_report
+    upload_original = KEEP_ORIGINAL or not ctx.annotated_data
+    ctx.image_url, ctx.annotated_image_url, llm_report = await asyncio.gather(
+        upload_image_async(ctx.image_data) if upload_original else _none(),
+        upload_image_async(ctx.annotated_data) if ctx.annotated_data else _none(),
+        asyncio.to_thread(generate_report, ctx.detections)
+    )
+    if not upload_original and not ctx.annotated_image_url:
+        # The annotated upload failed; fall back to the skipped original
+        logger.warning("⚠️ Failed to upload annotated image for %s", ctx.name)
+        ctx.image_url = await upload_image_async(ctx.image_data)
+    ctx.image_data = ctx.annotated_data = None  # Release the bytes early
+    if not ctx.image_url and not ctx.annotated_image_url:
+        logger.error("❌ Failed to upload image for %s", ctx.name)
+        return False
+    ctx.annotated_image_url = ctx.annotated_image_url or ctx.image_url
+    ctx.llm_report = _checked_report(llm_report)
+    return True
+
+async def _store_stage(ctx):
+    """Queues the row for the write-behind flusher; success is settled after flush_scans()."""
+    from utils.database import queue_scan_data
+    ctx.stored = queue_scan_data(
+        latitude=ctx.lat,
+        longitude=ctx.lon,
+        image_url=ctx.image_url,
+        annotated_image_url=ctx.annotated_image_url,
+        detection_results=ctx.detections,
+        llm_report_text=json.dumps(ctx.llm_report, indent=2),
+        llm_report_structured=ctx.llm_report
+    )
+    if ctx.stored is None:
+        logger.error("❌ Failed to queue scan data for %s", ctx.name)
+        return False
+    logger.debug("%s queued for the database", ctx.name)
+    return True
+
+async def _run_stage(stage, in_queue, out_queue, workers, batch_size=None):
+    """
+    Runs `workers` copies of a stage, moving contexts from in_queue to out_queue.
+
+    With batch_size, a worker takes whatever is already queued (up to
+    batch_size contexts, without waiting for more) and the stage receives and
+    returns lists of contexts.
+
+    A None sentinel ends the stage: each worker puts it back for its siblings,
+    and once all have stopped a single None is passed downstream.
+    """
+    async def worker():
+        done = False
+        while not done:
+            ctx = await in_queue.get()
+            if ctx is None:
+                break
+            batch = [ctx]
+            while batch_size and len(batch) < batch_size and not in_queue.empty():
+                ctx = in_queue.get_nowait()
+                if ctx is None:
+                    done = True
+                    break
+                batch.append(ctx)
+
+            try:
+                if batch_size:
+                    kept = await stage(batch)
+                else:
+                    kept = [ctx] if await stage(ctx) else []
+            except Exception as e:
+                names = ", ".join(c.name for c in batch)
+                logger.error("❌ %s failed in %s: %s", names, stage.__name__, e)
+                logger.debug("Full traceback: %s", traceback.format_exc())
+                kept = []
+            if out_queue is not None:
+                for kept_ctx in kept:
+                    await out_queue.put(kept_ctx)
+        await in_queue.put(None)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if out_queue is not None:
+        await out_queue.put(None)
+
+async def scan_multiple_locations_async(locations, concurrency=DEFAULT_BATCH_CONCURRENCY):
+    """
+    Async version of scan_multiple_locations().
+
+    Scans flow through a pipeline of stages (fetch -> CV -> upload/report ->
+    store) connected by queues, so one scan's fetch overlaps another's CV
+    analysis. Network stages run `concurrency` workers; CV runs
+    CV_STAGE_WORKERS so the model isn't oversubscribed, and each CV worker
+    batches up to CV_BATCH_SIZE waiting images into one DETR pass.
+
+    Args:
+        Same as scan_multiple_locations.
+
+    Returns:
+        dict: Results summary, with locations in their original order
+    """
     results = {
         'successful': [],
         'failed': [],
         'total': len(locations)
     }
     
-    print(f"📍 Starting batch scan of {len(locations)} locations...")
+    logger.info("📍 Starting batch scan of %s locations (concurrency: %s)...", len(locations), concurrency)
     
-    for i, (lat, lon, name) in enumerate(locations):
-        print(f"\n--- Scanning location {i+1}/{len(locations)}: {name} ---")
-        
-        success = main(lat, lon)
-        if success:
-            results['successful'].append((lat, lon, name))
-            print(f"✅ {name} completed successfully")
-        else:
-            results['failed'].append((lat, lon, name))
-            print(f"❌ {name} failed")
+    # Load models once before the workers start, rather than in every worker at once
+    await asyncio.to_thread(warmup)
+
+    contexts = [ScanContext(i, lat, lon, name) for i, (lat, lon, name) in enumerate(locations)]
+    io_workers = max(1, concurrency)
+
+    # Bounded queues so a fast stage can't run far ahead of a slow one
+    fetch_q, analyze_q, publish_q, store_q = (asyncio.Queue(maxsize=io_workers) for _ in range(4))
+
+    async def feed():
+        for ctx in contexts:
+            await fetch_q.put(ctx)
+        await fetch_q.put(None)
+
+    await asyncio.gather(
+        feed(),
+        _run_stage(_fetch_stage, fetch_q, analyze_q, io_workers),
+        _run_stage(_analyze_stage, analyze_q, publish_q, CV_STAGE_WORKERS, batch_size=CV_BATCH_SIZE),
+        _run_stage(_publish_stage, publish_q, store_q, io_workers),
+        _run_stage(_store_stage, store_q, None, STORE_STAGE_WORKERS)
+    )
+
+    # Wait for the queued inserts so the batch is fully stored on return
+    from utils.database import flush_scans
+    await asyncio.to_thread(flush_scans)
+
+    # A scan only succeeded once its row is confirmed stored
+    for ctx in contexts:
+        if ctx.stored is not None and ctx.stored.result():
+            ctx.success = True
+            _remember_scan(ctx.lat, ctx.lon)
+            logger.info("✅ %s completed successfully", ctx.name)
+
+    for ctx, location in zip(contexts, locations):
+        if not ctx.success:
+            logger.error("❌ %s failed", ctx.name)
+        results['successful' if ctx.success else 'failed'].append(tuple(location))
     
     # Print summary
+    flush_logs()  # Keep the summary below the per-scan log lines
     print(f"\n📊 Batch scan summary:")
     print(f"   Total locations: {results['total']}")
     print(f"   Successful: {len(results['successful'])}")
@@ -246,17 +671,23 @@ if __name__ == "__main__":
     parser.add_argument('--lon', type=float, required=True, help='Longitude of the location to scan')
     parser.add_argument('--retry', type=int, default=2, help='Number of retry attempts (default: 2)')
     parser.add_argument('--batch', type=str, help='Path to CSV file with locations (columns: lat,lon,name)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_BATCH_CONCURRENCY,
+                        help=f'Max scans run at once in batch mode (default: {DEFAULT_BATCH_CONCURRENCY})')
     
     args = parser.parse_args()
+
+    # Per-scan progress is noise across a whole batch; keep warnings and errors
+    if args.batch:
+        setup_logging(level="WARNING")
     
     if args.batch:
         # Batch mode
         try:
-            import pandas as pd
-            df = pd.read_csv(args.batch)
-            locations = [(row['lat'], row['lon'], row.get('name', f'Location_{i}')) 
-                        for i, row in df.iterrows()]
-            scan_multiple_locations(locations)
+            import csv
+            with open(args.batch, newline='') as fh:
+                locations = [(float(row['lat']), float(row['lon']), row.get('name') or f'Location_{i}')
+                             for i, row in enumerate(csv.DictReader(fh))]
+            scan_multiple_locations(locations, concurrency=args.concurrency)
         except Exception as e:
             print(f"Error processing batch file: {e}")
     else:
@@ -1,117 +1,234 @@
 import os
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+import httpx
+from cachetools import LRUCache
 from dotenv import load_dotenv
-from datetime import datetime
-import uuid
+import hashlib
+import threading
+import asyncio
+import logging
+from io import BytesIO
 
-load_dotenv()
+# Containers inject env directly; only search for a .env file when it's missing
+if "SUPABASE_URL" not in os.environ:
+    load_dotenv()
 
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_ANON_KEY")
 
+logger = logging.getLogger(__name__)
+
 # Validate environment variables
 if not url or not key:
     raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables")
 
-supabase: Client = create_client(url, key)
+# Keep-alive pool shared by all storage calls, so repeated uploads skip the TCP/TLS handshake
+_http_client = httpx.Client(
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+    http2=True,
+    timeout=30.0
+)
+
+supabase: Client = create_client(url, key, options=SyncClientOptions(httpx_client=_http_client))
+
+# Public object URL for a bucket/name pair, e.g. PUBLIC_URL_TEMPLATE.format(bucket=..., name=...)
+PUBLIC_URL_TEMPLATE = f"{url}/storage/v1/object/public/{{bucket}}/{{name}}"
+
+# Opt-in WebP re-encoding of uploads; smaller than JPEG at the same visual quality
+UPLOAD_WEBP = os.environ.get("SUPABASE_UPLOAD_WEBP") == "1"
+WEBP_QUALITY = 85
+WEBP_SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Content-addressed objects never change, so CDNs and browsers can keep them for a year
+IMMUTABLE_CACHE_CONTROL = "31536000"
+
+# Public URLs of content hashes already uploaded by this process, per bucket
+# (bounded, so long-running batch processes don't grow it without limit)
+UPLOADED_HASH_CACHE_SIZE = 4096
+_uploaded_hashes = LRUCache(maxsize=UPLOADED_HASH_CACHE_SIZE)
+_uploaded_hashes_lock = threading.Lock()
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+def _content_file_name(image, file_extension):
+    """Builds a storage path from the SHA-256 of a file or bytes, e.g. 'ab/abcd...ef.jpg'."""
+    if isinstance(image, (bytes, bytearray)):
+        sha = hashlib.sha256(image)
+    else:
+        sha = hashlib.sha256()
+        with open(image, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                sha.update(chunk)
+    digest = sha.hexdigest()
+    return f"{digest[:2]}/{digest}{file_extension}"
+
+def _encode_webp(image):
+    """Re-encodes an image (path or bytes) as WebP bytes, or returns None if it can't be decoded."""
+    from PIL import Image
+    try:
+        source = BytesIO(image) if isinstance(image, (bytes, bytearray)) else image
+        with Image.open(source) as img:
+            buffer = BytesIO()
+            img.save(buffer, format='WEBP', quality=WEBP_QUALITY, method=4)
+        return buffer.getvalue()
+    except (OSError, ValueError) as e:
+        logger.debug("Could not convert image to WebP, uploading as is: %s", e)
+        return None
+
+def _is_duplicate_error(error):
+    """True if Storage rejected an upload because the object already exists."""
+    error_message = str(error).lower()
+    return 'duplicate' in error_message or 'already exists' in error_message
 
 def upload_image_to_supabase(local_image_path, bucket_name='street-view-images'):
     """
     Uploads an image to the Supabase Storage bucket and returns its public URL.
 
+    The object is named after the SHA-256 of its contents, so an identical
+    image (e.g. a repeat scan of the same spot) reuses the existing object
+    instead of being uploaded again. Objects may be shared by several scans.
+
     Args:
-        local_image_path (str): The path to the image file on the local system.
+        local_image_path (str or bytes): The path to the image file on the local
+            system, or the JPEG data itself (uploaded without touching disk).
+            With SUPABASE_UPLOAD_WEBP=1, JPEG/PNG images are re-encoded as WebP.
         bucket_name (str): The name of the Supabase storage bucket.
 
     Returns:
         str: The public URL of the uploaded image, or None if failed.
     """
     try:
-        print(f"DEBUG: Uploading image from {local_image_path} to bucket '{bucket_name}'")
-        
-        # Check if the local file exists
-        if not os.path.exists(local_image_path):
-            print(f"Error: Local file does not exist: {local_image_path}")
-            return None
-        
-        # Check file size
-        file_size = os.path.getsize(local_image_path)
-        print(f"DEBUG: File size: {file_size} bytes")
-        
-        if file_size == 0:
-            print("Error: File is empty")
-            return None
-        
-        # Generate a unique filename to avoid overwrites
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        file_extension = os.path.splitext(local_image_path)[1] or '.jpg'
-        file_name = f"scan_{timestamp}_{unique_id}{file_extension}"
-        
-        print(f"DEBUG: Generated filename: {file_name}")
+        in_memory = isinstance(local_image_path, (bytes, bytearray))
+        if in_memory:
+            logger.debug("Uploading %s bytes to bucket '%s'", len(local_image_path), bucket_name)
+            if not local_image_path:
+                logger.error("Image data is empty")
+                return None
+            file_extension = '.jpg'
+        else:
+            logger.debug("Uploading image from %s to bucket '%s'", local_image_path, bucket_name)
+            
+            # Check if the local file exists
+            if not os.path.exists(local_image_path):
+                logger.error("Local file does not exist: %s", local_image_path)
+                return None
+            
+            # Check file size
+            file_size = os.path.getsize(local_image_path)
+            logger.debug("File size: %s bytes", file_size)
+            
+            if file_size == 0:
+                logger.error("File is empty")
+                return None
+            
+            file_extension = os.path.splitext(local_image_path)[1] or '.jpg'
+
+        file_options = {'content-type': 'image/jpeg'}
+        if UPLOAD_WEBP and file_extension.lower() in WEBP_SOURCE_EXTENSIONS:
+            webp_data = _encode_webp(local_image_path)
+            if webp_data:
+                local_image_path, in_memory = webp_data, True
+                file_extension = '.webp'
+                file_options['content-type'] = 'image/webp'
 
-        # Read the local file as binary data
-        with open(local_image_path, 'rb') as f:
-            file_data = f.read()
+        file_name = _content_file_name(local_image_path, file_extension)
+        with _uploaded_hashes_lock:
+            known_url = _uploaded_hashes.get((bucket_name, file_name))
+        if known_url:
+            logger.debug("Identical image already uploaded, reusing %s", known_url)
+            return known_url
+        file_options['cache-control'] = IMMUTABLE_CACHE_CONTROL
+        file_options['upsert'] = 'false'
 
-        print(f"DEBUG: Read {len(file_data)} bytes from file")
+        logger.debug("Generated filename: %s", file_name)
 
         # Upload the file to the bucket
         try:
-            print("DEBUG: Attempting upload to Supabase...")
-            response = supabase.storage.from_(bucket_name).upload(file_name, file_data, file_options={'content-type': 'image/jpeg'})
-            
-            print(f"DEBUG: Upload response: {response}")
+            logger.debug("Attempting upload to Supabase...")
+            try:
+                if in_memory:
+                    response = supabase.storage.from_(bucket_name).upload(file_name, bytes(local_image_path), file_options=file_options)
+                else:
+                    # Pass the open file so httpx streams it instead of buffering a copy
+                    with open(local_image_path, 'rb') as f:
+                        response = supabase.storage.from_(bucket_name).upload(file_name, f, file_options=file_options)
+            except Exception as upload_error:
+                # Same content was uploaded before (possibly by another process)
+                if not _is_duplicate_error(upload_error):
+                    raise
+                logger.debug("%s already exists in bucket, skipping upload", file_name)
+                response = None
+
+            logger.debug("Upload response: %s", response)
             
             # Check if upload was successful
             if hasattr(response, 'error') and response.error:
-                print(f"Error during upload: {response.error}")
+                logger.error("Error during upload: %s", response.error)
                 return None
             
-            # Get the public URL
-            print("DEBUG: Getting public URL...")
-            public_url_response = supabase.storage.from_(bucket_name).get_public_url(file_name)
-            
-            if isinstance(public_url_response, str):
-                public_url = public_url_response
-            elif hasattr(public_url_response, 'publicUrl'):
-                public_url = public_url_response.publicUrl
-            elif hasattr(public_url_response, 'public_url'):
-                public_url = public_url_response.public_url
-            else:
-                print(f"DEBUG: Unexpected public URL response format: {public_url_response}")
-                # Construct URL manually as fallback
-                public_url = f"{url}/storage/v1/object/public/{bucket_name}/{file_name}"
-            
-            print(f"Image successfully uploaded. Public URL: {public_url}")
+            # Public bucket URLs are deterministic, so build it instead of asking Supabase
+            public_url = PUBLIC_URL_TEMPLATE.format(bucket=bucket_name, name=file_name)
+
+            with _uploaded_hashes_lock:
+                _uploaded_hashes[(bucket_name, file_name)] = public_url
+
+            logger.info("Image successfully uploaded. Public URL: %s", public_url)
             return public_url
             
         except Exception as upload_error:
-            print(f"Error during upload operation: {upload_error}")
+            logger.error("Error during upload operation: %s", upload_error)
             
             # Try to handle specific error cases
             error_message = str(upload_error).lower()
             if 'bucket' in error_message and 'not found' in error_message:
-                print(f"Bucket '{bucket_name}' does not exist. Please create it in your Supabase dashboard.")
+                logger.error("Bucket '%s' does not exist. Please create it in your Supabase dashboard.", bucket_name)
             elif 'permission' in error_message or 'unauthorized' in error_message:
-                print("Permission denied. Check your Supabase RLS policies and API key permissions.")
-            elif 'duplicate' in error_message:
-                print("File with this name already exists. This shouldn't happen with UUIDs.")
+                logger.error("Permission denied. Check your Supabase RLS policies and API key permissions.")
             
             return None
             
     except FileNotFoundError:
-        print(f"Error: Could not find file: {local_image_path}")
+        logger.error("Could not find file: %s", local_image_path)
         return None
     except PermissionError:
-        print(f"Error: Permission denied accessing file: {local_image_path}")
+        logger.error("Permission denied accessing file: %s", local_image_path)
         return None
     except Exception as e:
-        print(f"Error: Unexpected error occurred: {e}")
+        logger.error("Unexpected error occurred: %s", e)
         import traceback
-        print(f"DEBUG: Full traceback: {traceback.format_exc()}")
+        logger.debug("Full traceback: %s", traceback.format_exc())
         return None
 
+async def upload_image_async(local_image_path, bucket_name='street-view-images'):
+    """
+    Runs upload_image_to_supabase in a worker thread so several uploads can
+    be awaited together.
+
+    Args:
+        Same as upload_image_to_supabase.
+
+    Returns:
+        str: The public URL of the uploaded image, or None if failed.
+    """
+    return await asyncio.to_thread(upload_image_to_supabase, local_image_path, bucket_name)
+
+PUBLIC_OBJECT_MARKER = '/object/public/'
+
+def _forget_uploads(bucket_name, file_names):
+    """Drops deleted objects from the dedupe cache so they get uploaded again."""
+    with _uploaded_hashes_lock:
+        for file_name in file_names:
+            _uploaded_hashes.pop((bucket_name, file_name), None)
+
+def _parse_public_url(file_url):
+    """Splits a public object URL into (bucket, filename), or (None, None) if it isn't one."""
+    _, sep, path = file_url.rpartition(PUBLIC_OBJECT_MARKER)
+    bucket_name, slash, filename = path.partition('/')
+    if not sep or not slash or not filename:
+        return None, None
+    return bucket_name, filename
+
 def delete_image_from_supabase(file_url, bucket_name='street-view-images'):
     """
     Deletes an image from Supabase storage using its public URL.
@@ -126,27 +243,62 @@ def delete_image_from_supabase(file_url, bucket_name='street-view-images'):
     try:
         # Extract filename from URL
         # URL format: https://your-project.supabase.co/storage/v1/object/public/bucket-name/filename
-        if f'/object/public/{bucket_name}/' in file_url:
-            filename = file_url.split(f'/object/public/{bucket_name}/')[-1]
-        else:
-            print(f"Error: Could not extract filename from URL: {file_url}")
+        _, sep, filename = file_url.rpartition(f'{PUBLIC_OBJECT_MARKER}{bucket_name}/')
+        if not sep:
+            logger.error("Could not extract filename from URL: %s", file_url)
             return False
         
-        print(f"DEBUG: Attempting to delete {filename} from bucket {bucket_name}")
+        logger.debug("Attempting to delete %s from bucket %s", filename, bucket_name)
         
         response = supabase.storage.from_(bucket_name).remove([filename])
         
         if hasattr(response, 'error') and response.error:
-            print(f"Error deleting file: {response.error}")
+            logger.error("Error deleting file: %s", response.error)
             return False
         
-        print(f"Successfully deleted {filename}")
+        _forget_uploads(bucket_name, [filename])
+        logger.info("Successfully deleted %s", filename)
         return True
         
     except Exception as e:
-        print(f"Error deleting file: {e}")
+        logger.error("Error deleting file: %s", e)
         return False
 
+def delete_images_from_supabase(file_urls):
+    """
+    Deletes several images by public URL with one remove request per bucket.
+
+    Args:
+        file_urls (iterable): Public URLs of the files to delete.
+
+    Returns:
+        bool: True if every file was deleted, False otherwise.
+    """
+    filenames_by_bucket = {}
+    success = True
+    for file_url in file_urls:
+        bucket_name, filename = _parse_public_url(file_url)
+        if bucket_name is None:
+            logger.error("Could not extract filename from URL: %s", file_url)
+            success = False
+            continue
+        filenames_by_bucket.setdefault(bucket_name, []).append(filename)
+
+    for bucket_name, filenames in filenames_by_bucket.items():
+        try:
+            response = supabase.storage.from_(bucket_name).remove(filenames)
+            if hasattr(response, 'error') and response.error:
+                logger.error("Error deleting files from %s: %s", bucket_name, response.error)
+                success = False
+                continue
+            _forget_uploads(bucket_name, filenames)
+            logger.info("Successfully deleted %s files from %s", len(filenames), bucket_name)
+        except Exception as e:
+            logger.error("Error deleting files from %s: %s", bucket_name, e)
+            success = False
+
+    return success
+
 def list_bucket_files(bucket_name='street-view-images', limit=100):
     """
     Lists files in a Supabase storage bucket.
@@ -162,15 +314,15 @@ def list_bucket_files(bucket_name='street-view-images', limit=100):
         response = supabase.storage.from_(bucket_name).list(limit=limit)
         
         if hasattr(response, 'error') and response.error:
-            print(f"Error listing files: {response.error}")
+            logger.error("Error listing files: %s", response.error)
             return []
         
         files = response if isinstance(response, list) else []
-        print(f"Found {len(files)} files in bucket '{bucket_name}'")
+        logger.info("Found %s files in bucket '%s'", len(files), bucket_name)
         return files
         
     except Exception as e:
-        print(f"Error listing bucket files: {e}")
+        logger.error("Error listing bucket files: %s", e)
         return []
 
 def create_bucket_if_not_exists(bucket_name='street-view-images', public=True):
@@ -191,26 +343,26 @@ def create_bucket_if_not_exists(bucket_name='street-view-images', public=True):
         if hasattr(response, 'error') and response.error:
             error_message = str(response.error).lower()
             if 'not found' in error_message or 'does not exist' in error_message:
-                print(f"Bucket '{bucket_name}' does not exist. Attempting to create...")
+                logger.info("Bucket '%s' does not exist. Attempting to create...", bucket_name)
                 
                 # Create the bucket
                 create_response = supabase.storage.create_bucket(bucket_name, public=public)
                 
                 if hasattr(create_response, 'error') and create_response.error:
-                    print(f"Error creating bucket: {create_response.error}")
+                    logger.error("Error creating bucket: %s", create_response.error)
                     return False
                 
-                print(f"Successfully created bucket '{bucket_name}'")
+                logger.info("Successfully created bucket '%s'", bucket_name)
                 return True
             else:
-                print(f"Error checking bucket: {response.error}")
+                logger.error("Error checking bucket: %s", response.error)
                 return False
         
-        print(f"Bucket '{bucket_name}' already exists")
+        logger.info("Bucket '%s' already exists", bucket_name)
         return True
         
     except Exception as e:
-        print(f"Error with bucket operations: {e}")
+        logger.error("Error with bucket operations: %s", e)
         return False
 
 # Test the storage functions